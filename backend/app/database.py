@@ -1,12 +1,52 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.errors import ConnectionFailure
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import ConnectionFailure, DuplicateKeyError, OperationFailure
+import logging
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "gastric_cancer_fl")
+ENSURE_INDEXES = os.getenv("MONGODB_ENSURE_INDEXES", "true").lower() in ("1", "true", "yes")
+
+# (collection, key spec, options). Names are fixed so re-running is a no-op.
+INDEXES = [
+    ("users", [("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+    ("users", [("username", ASCENDING)], {"name": "username_unique", "unique": True}),
+    ("users", [("user_id", ASCENDING)], {"name": "user_id_unique", "unique": True}),
+    ("users", [("verification_token", ASCENDING)], {
+        "name": "verification_token",
+        # Verified users have a null token; keep them out of the index
+        "partialFilterExpression": {"verification_token": {"$type": "string"}},
+    }),
+    # Unverified accounts are removed once their verification link expires
+    ("users", [("verification_token_expiry", ASCENDING)], {
+        "name": "unverified_user_ttl",
+        "expireAfterSeconds": 0,
+        "partialFilterExpression": {"is_verified": False},
+    }),
+    ("images", [("image_id", ASCENDING)], {"name": "image_id_unique", "unique": True}),
+    # /image/history: keyset pages of find({"user_id"}) sorted by (upload_date, image_id) desc
+    ("images", [("user_id", ASCENDING), ("upload_date", DESCENDING), ("image_id", DESCENDING)],
+     {"name": "user_id_upload_date_image_id"}),
+    ("images", [("job.job_id", ASCENDING)], {"name": "job_id", "sparse": True}),
+]
+
+# (collection, name) of indexes replaced by an entry in INDEXES; dropped once the replacement exists
+RETIRED_INDEXES = [
+    # Superseded by user_id_upload_date_image_id, which serves the same queries
+    ("images", "user_id_upload_date"),
+]
+
+# Server error codes for an index that exists with different options or keys under the same name
+INDEX_CONFLICT_CODES = (85, 86)
+# NamespaceNotFound, IndexNotFound
+INDEX_MISSING_CODES = (26, 27)
 
 client: AsyncIOMotorClient = None
 database = None
@@ -22,6 +62,46 @@ async def connect_to_mongo():
     except ConnectionFailure as e:
         print(f"Failed to connect to MongoDB: {e}")
         raise
+    if ENSURE_INDEXES:
+        await ensure_indexes(database)
+
+async def ensure_indexes(db):
+    """
+    Create the indexes in INDEXES if missing and drop RETIRED_INDEXES.
+    Idempotent. Raises (so startup fails) if an index conflicts with an
+    existing one or a unique index cannot be built because the collection
+    already holds duplicates.
+    """
+    started = time.perf_counter()
+    for collection, keys, options in INDEXES:
+        index_started = time.perf_counter()
+        try:
+            await db[collection].create_index(keys, **options)
+        except DuplicateKeyError as e:
+            logger.error(
+                "Cannot build unique index %s.%s: existing documents have duplicate keys (%s). "
+                "Remove the duplicates and restart.", collection, options["name"], e,
+            )
+            raise
+        except OperationFailure as e:
+            if e.code in INDEX_CONFLICT_CODES:
+                logger.error(
+                    "Index %s.%s conflicts with an existing index (%s). Drop the old index and restart.",
+                    collection, options["name"], e,
+                )
+            raise
+        logger.info(
+            "Index %s.%s ready in %.1f ms", collection, options["name"], (time.perf_counter() - index_started) * 1000
+        )
+    for collection, name in RETIRED_INDEXES:
+        try:
+            await db[collection].drop_index(name)
+        except OperationFailure as e:
+            if e.code not in INDEX_MISSING_CODES:
+                raise
+        else:
+            logger.info("Dropped retired index %s.%s", collection, name)
+    logger.info("Ensured %d indexes in %.2fs", len(INDEXES), time.perf_counter() - started)
 
 async def close_mongo_connection():
     global client
@@ -1,8 +1,18 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, status
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from app.routers import auth, image
+from app.routers import admin, auth, image
 from app.database import connect_to_mongo, close_mongo_connection
+from app.ml.batching import stop_batcher
+from app.ml.worker_pool import stop_worker_pool
+from app.ml.jobs import start_job_queue, stop_job_queue
+from app.ml.rescoring import stop_rescore_task
+from app.ml.reload import stop_model_watcher
+from app.ml.startup import cancel_inference_startup, inference_error, inference_ready, start_inference
+from app.utils.auth import shutdown_password_hashing
+from app.utils.metrics import render_metrics
+from app.utils.uploads import UploadSizeLimitMiddleware
 import os
 from dotenv import load_dotenv
 
@@ -18,11 +28,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
+app.add_middleware(UploadSizeLimitMiddleware)
 
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(image.router, prefix="/image", tags=["image"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"])
 
 # Serve uploaded images
 if os.path.exists("uploads"):
@@ -31,9 +44,19 @@ if os.path.exists("uploads"):
 @app.on_event("startup")
 async def startup_event():
     await connect_to_mongo()
+    # Worker pool, batcher and model warm-up come up in the background; see /health.
+    # The job queue starts (and recovers abandoned jobs) only once they are up.
+    start_inference(on_ready=lambda: start_job_queue(image.run_prediction_job))
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await cancel_inference_startup()
+    await stop_model_watcher()
+    await stop_rescore_task()
+    await stop_job_queue()
+    await stop_batcher()
+    await stop_worker_pool()
+    shutdown_password_hashing()
     await close_mongo_connection()
 
 @app.get("/")
@@ -42,5 +65,15 @@ async def root():
 
 @app.get("/health")
 async def health():
+    """Readiness: 503 until the model is loaded and warmed up"""
+    if not inference_ready():
+        error = inference_error()
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unavailable", "error": error} if error else {"status": "starting"},
+        )
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_metrics()
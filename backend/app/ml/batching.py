@@ -0,0 +1,220 @@
+"""
+Dynamic micro-batching for model inference.
+
+Concurrent requests submit single image paths; a collector task groups
+whatever arrives within a short window (bounded by a maximum batch size),
+runs one batched forward pass in an executor and resolves each waiting
+request with its own result.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, List, Optional, Sequence
+
+from app.ml.inference import predict_batch
+from app.ml.instrumentation import EXECUTOR_QUEUE_GAUGE, ERRORS_COUNTER, observe_predictions
+from app.ml.worker_pool import INFERENCE_WORKERS, get_worker_pool, run_in_pool
+from app.utils.metrics import gauge, histogram
+
+logger = logging.getLogger(__name__)
+
+BATCHING_ENABLED = os.getenv("INFERENCE_BATCHING_ENABLED", "true").lower() in ("1", "true", "yes")
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+
+BATCH_SIZE_HISTOGRAM = histogram(
+    "inference_batch_size",
+    "Number of images per batched forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+QUEUE_WAIT_HISTOGRAM = histogram(
+    "inference_queue_wait_seconds",
+    "Time a prediction waited in the batching queue before dispatch",
+)
+QUEUE_DEPTH_GAUGE = gauge(
+    "inference_batching_queue_depth",
+    "Predictions waiting in the batching queue",
+)
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Collects submitted items into batches and runs them through ``runner``."""
+
+    def __init__(
+        self,
+        runner: Callable[[Sequence[Any]], List[Any]],
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = MAX_WAIT_MS,
+        executor: Optional[Executor] = None,
+        max_concurrent_batches: int = 1,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.runner = runner
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_ms, 0.0) / 1000.0
+        self.executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._max_concurrent_batches = max_concurrent_batches
+        self._collector: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+
+    def qsize(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    @property
+    def running(self) -> bool:
+        return self._collector is not None and not self._collector.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self._max_concurrent_batches)
+        self._collector = asyncio.create_task(self._collect())
+
+    async def stop(self) -> None:
+        """Flush queued work, wait for in-flight batches and stop the collector."""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._collector
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        self._collector = None
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result."""
+        if not self.running:
+            raise RuntimeError("MicroBatcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            await self._slots.acquire()
+            first = await self._queue.get()
+            if first is _STOP:
+                self._slots.release()
+                break
+
+            batch = [first]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                try:
+                    if timeout <= 0:
+                        entry = self._queue.get_nowait()
+                    else:
+                        entry = await asyncio.wait_for(self._queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: list) -> None:
+        try:
+            dispatched_at = time.perf_counter()
+            BATCH_SIZE_HISTOGRAM.observe(len(batch))
+            for _, _, enqueued_at in batch:
+                QUEUE_WAIT_HISTOGRAM.observe(dispatched_at - enqueued_at)
+
+            items = [item for item, _, _ in batch]
+            EXECUTOR_QUEUE_GAUGE.inc()
+            try:
+                results = await run_in_pool(self.executor, self.runner, items)
+            except Exception as exc:
+                ERRORS_COUNTER.labels(stage="inference_batch").inc()
+                failure = exc
+            else:
+                failure = None
+            finally:
+                EXECUTOR_QUEUE_GAUGE.dec()
+
+            if failure is not None:
+                if len(batch) == 1:
+                    logger.error("Inference failed for %s", items[0], exc_info=failure)
+                    if not batch[0][1].done():
+                        batch[0][1].set_exception(failure)
+                    return
+                # One bad item (e.g. a corrupt upload) must not fail everyone batched with it
+                logger.warning(
+                    "Batched inference failed for %d items (%s); retrying them one by one", len(items), failure
+                )
+                await asyncio.gather(*[self._dispatch_single(entry) for entry in batch])
+                return
+            observe_predictions(results)
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    async def _dispatch_single(self, entry: tuple) -> None:
+        """Run one item of a failed batch on its own and resolve only its future."""
+        item, future, _ = entry
+        EXECUTOR_QUEUE_GAUGE.inc()
+        try:
+            results = await run_in_pool(self.executor, self.runner, [item])
+        except Exception as exc:
+            ERRORS_COUNTER.labels(stage="inference_batch").inc()
+            logger.exception("Inference failed for %s", item)
+            if not future.done():
+                future.set_exception(exc)
+            return
+        finally:
+            EXECUTOR_QUEUE_GAUGE.dec()
+        observe_predictions(results)
+        if not future.done():
+            future.set_result(results[0])
+
+
+_batcher: Optional[MicroBatcher] = None
+QUEUE_DEPTH_GAUGE.set_function(lambda: _batcher.qsize() if _batcher else 0)
+
+
+async def start_batcher() -> None:
+    global _batcher
+    if not BATCHING_ENABLED:
+        return
+    pool = get_worker_pool()
+    # With a process pool, keep one batch in flight per worker
+    _batcher = MicroBatcher(
+        predict_batch,
+        executor=pool,
+        max_concurrent_batches=INFERENCE_WORKERS if pool is not None else 1,
+    )
+    await _batcher.start()
+    logger.info(
+        "Inference micro-batching enabled (max_batch_size=%d, max_wait_ms=%s, workers=%s)",
+        MAX_BATCH_SIZE,
+        MAX_WAIT_MS,
+        INFERENCE_WORKERS if pool is not None else "threads",
+    )
+
+
+async def stop_batcher() -> None:
+    global _batcher
+    if _batcher:
+        await _batcher.stop()
+        _batcher = None
+
+
+def get_batcher() -> Optional[MicroBatcher]:
+    return _batcher
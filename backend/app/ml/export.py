@@ -0,0 +1,91 @@
+"""
+Ahead-of-time export of the serving checkpoint.
+
+Converts ``saved_models/global_model.pth`` into a traced and frozen
+TorchScript artifact (``global_model.ts``). When the artifact exists and
+was built from the current checkpoint, ``_load_model`` serves it directly:
+no model class import, no pickle shims and no torchvision graph rebuild on
+worker start. Backend-specific fusions (``optimize_for_inference``) are not
+serializable, so the loader applies them after loading.
+
+Usage (from the backend directory):
+
+    python -m app.ml.export
+    python -m app.ml.export --output /tmp/global_model.ts --device cpu
+"""
+
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+import torch
+
+from app.ml import inference
+from app.ml.inference import (
+    COMPILED_MODEL_PATH,
+    MODEL_PATH,
+    _load_fp32_model,
+    checkpoint_sha256,
+    load_script_artifact,
+    save_script_artifact,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def compile_model(model: torch.nn.Module, device: torch.device) -> torch.jit.ScriptModule:
+    """Trace the eager model and freeze its weights into the graph as constants."""
+    example = torch.randn(1, 3, 224, 224, device=device)
+    with torch.no_grad():
+        traced = torch.jit.trace(model.to(device).eval(), example)
+        return torch.jit.freeze(traced)
+
+
+def export(output: Path, device: torch.device) -> dict:
+    start = time.perf_counter()
+    eager = _load_fp32_model().to(device).eval()
+    eager_load_s = time.perf_counter() - start
+
+    compiled = compile_model(eager, device)
+    save_script_artifact(
+        compiled,
+        output,
+        {"source_sha256": checkpoint_sha256(MODEL_PATH), "device": device.type},
+    )
+
+    start = time.perf_counter()
+    reloaded, _ = load_script_artifact(output, ("source_sha256",), map_location=device)
+    reloaded = torch.jit.optimize_for_inference(reloaded)
+    compiled_load_s = time.perf_counter() - start
+
+    # Sanity-check the artifact against the eager model on a small random batch
+    sample = torch.randn(4, 3, 224, 224, device=device)
+    with torch.no_grad():
+        max_abs_diff = (eager(sample) - reloaded(sample)).abs().max().item()
+
+    return {
+        "output": str(output),
+        "device": device.type,
+        "eager_load_seconds": round(eager_load_s, 4),
+        "compiled_load_seconds": round(compiled_load_s, 4),
+        "max_abs_output_diff": max_abs_diff,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Export the serving checkpoint to frozen TorchScript")
+    parser.add_argument("--output", type=Path, default=COMPILED_MODEL_PATH)
+    parser.add_argument(
+        "--device",
+        default=inference.DEVICE.type,
+        help="Device the artifact is optimized for; the loader ignores it on other devices",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(export(args.output, torch.device(args.device)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,50 @@
+import hashlib
 import json
 import logging
-from functools import lru_cache
+import os
+import random
 import sys
+import threading
+import time
 import types
 from pathlib import Path
-from typing import Dict, Union
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 
 import torch
 import torch.nn as nn
-from torch.serialization import add_safe_globals
-from PIL import Image
 from torchvision import transforms
 
-# Import your model architecture
-from app.ml.mobilenetv3 import get_model, MobileNetV3Classifier
+from app.ml.preprocess import JPEG_DRAFT_ENABLED, preprocess_paths
 
 logger = logging.getLogger(__name__)
 
 # Resolve repo root (FYP-WebApp)
 BASE_DIR = Path(__file__).resolve().parents[2]
 MODEL_PATH = BASE_DIR / "saved_models" / "global_model.pth"
-DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+STATIC_QUANTIZED_MODEL_PATH = BASE_DIR / "saved_models" / "global_model.int8.pt"
+# Frozen TorchScript export of MODEL_PATH built by `python -m app.ml.export`
+COMPILED_MODEL_PATH = BASE_DIR / "saved_models" / "global_model.ts"
+
+# "none" serves the fp32 model, "dynamic" quantizes the Linear head at load time,
+# "static" serves the calibrated INT8 artifact built by `python -m app.ml.quantization`
+QUANTIZATION_MODE = os.getenv("INFERENCE_QUANTIZATION", "none").lower()
+if QUANTIZATION_MODE not in ("none", "dynamic", "static"):
+    raise ValueError(f"Unknown INFERENCE_QUANTIZATION mode: {QUANTIZATION_MODE}")
+
+# Quantized kernels are CPU-only
+DEVICE = torch.device(
+    "cuda" if torch.cuda.is_available() and QUANTIZATION_MODE == "none" else "cpu"
+)
+
+# Synthetic batch sizes run after every model load; match INFERENCE_MAX_BATCH_SIZE.
+# TorchScript specialises a graph on its second call, hence two iterations per size.
+WARMUP_BATCH_SIZES = tuple(
+    int(size) for size in os.getenv("MODEL_WARMUP_BATCH_SIZES", "1,8").split(",") if size.strip()
+)
+WARMUP_ITERATIONS = int(os.getenv("MODEL_WARMUP_ITERATIONS", "2"))
+
+# Fraction of batches whose raw output, results and stage timings are logged
+DEBUG_LOG_SAMPLE_RATE = float(os.getenv("INFERENCE_DEBUG_LOG_SAMPLE_RATE", "0"))
 
 # Update this mapping to match the 8 training classes
 # Order assumed: ADI, DEB, LYM, MUC, MUS, NOR, STR, TUM
@@ -35,6 +59,7 @@ IDX_TO_LABEL = {
     7: "TUM",
 }
 
+# Reference per-image transform; serving preprocesses in batch with app.ml.preprocess
 _transform = transforms.Compose(
     [
         transforms.Resize(256),
@@ -48,15 +73,208 @@ _transform = transforms.Compose(
 )
 
 
-@lru_cache(maxsize=1)
+def checkpoint_sha256(path: Path = MODEL_PATH) -> str:
+    """Hex SHA-256 of a checkpoint file, used to tie derived artifacts to their source."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_fingerprints: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+
+def checkpoint_fingerprint(path: Path) -> str:
+    """Short content hash of ``path``, re-hashed only when its size or mtime changes."""
+    stat = path.stat()
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _fingerprints.get(str(path))
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    fingerprint = checkpoint_sha256(path)[:16]
+    _fingerprints[str(path)] = (key, fingerprint)
+    return fingerprint
+
+
+def model_version() -> str:
+    """
+    Identify the model that would serve a request right now: the checkpoint
+    fingerprint plus the quantization mode, since INT8 serving changes outputs.
+    """
+    source = MODEL_PATH
+    if not source.exists():
+        # Artifact-only deployments: fingerprint the artifact that will be served
+        source = STATIC_QUANTIZED_MODEL_PATH if QUANTIZATION_MODE == "static" else COMPILED_MODEL_PATH
+    if not source.exists():
+        raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
+    fingerprint = checkpoint_fingerprint(source)
+    return fingerprint if QUANTIZATION_MODE == "none" else f"{fingerprint}-{QUANTIZATION_MODE}"
+
+
+def save_script_artifact(module: torch.jit.ScriptModule, path: Path, metadata: Dict[str, str]) -> None:
+    """Save a TorchScript module with string metadata stored alongside the graph."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    torch.jit.save(module, str(path), _extra_files=dict(metadata))
+
+
+def load_script_artifact(
+    path: Path, keys: Sequence[str], map_location: Union[str, torch.device] = DEVICE
+) -> Tuple[torch.jit.ScriptModule, Dict[str, str]]:
+    """Load a TorchScript artifact and the requested metadata entries."""
+    extra_files = {key: "" for key in keys}
+    module = torch.jit.load(str(path), map_location=map_location, _extra_files=extra_files)
+    metadata = {
+        key: value.decode() if isinstance(value, bytes) else value
+        for key, value in extra_files.items()
+    }
+    return module.eval(), metadata
+
+
+def is_artifact_current(metadata: Dict[str, str]) -> bool:
+    """True when an artifact was built from the checkpoint currently at MODEL_PATH.
+
+    Artifacts shipped without the source checkpoint are trusted as-is.
+    """
+    if not MODEL_PATH.exists():
+        return True
+    return metadata.get("source_sha256") == checkpoint_sha256(MODEL_PATH)
+
+
+def _load_compiled_model() -> Optional[torch.jit.ScriptModule]:
+    """Load the frozen TorchScript export if it exists and matches the checkpoint."""
+    if not COMPILED_MODEL_PATH.exists():
+        return None
+    model, metadata = load_script_artifact(COMPILED_MODEL_PATH, ("source_sha256", "device"))
+    if metadata.get("device") != DEVICE.type:
+        logger.warning(
+            "Ignoring %s: exported for %s but serving on %s",
+            COMPILED_MODEL_PATH, metadata.get("device") or "unknown device", DEVICE.type,
+        )
+        return None
+    if not is_artifact_current(metadata):
+        logger.warning("Ignoring stale %s; re-run `python -m app.ml.export`", COMPILED_MODEL_PATH)
+        return None
+    logger.info("✅ Compiled model loaded from %s", COMPILED_MODEL_PATH)
+    return torch.jit.optimize_for_inference(model)
+
+
+def _build_model():
+    """
+    Load the serving model from the current checkpoint, honouring INFERENCE_QUANTIZATION.
+    """
+    if QUANTIZATION_MODE == "static":
+        from app.ml.quantization import load_static_quantized_model
+
+        return load_static_quantized_model(STATIC_QUANTIZED_MODEL_PATH)
+
+    if QUANTIZATION_MODE == "none":
+        compiled = _load_compiled_model()
+        if compiled is not None:
+            return compiled
+
+    model = _load_fp32_model()
+    if QUANTIZATION_MODE == "dynamic":
+        from app.ml.quantization import quantize_head_dynamic
+
+        model = quantize_head_dynamic(model)
+        logger.info("Serving dynamically quantized (INT8 Linear head) model")
+    return model
+
+
+def _warm_up(model) -> None:
+    """
+    Run synthetic batches at the expected sizes so allocator growth, kernel
+    selection and TorchScript profiling happen before real traffic does.
+    """
+    started = time.perf_counter()
+    with torch.no_grad():
+        for batch_size in WARMUP_BATCH_SIZES:
+            batch = torch.zeros((batch_size, 3, 224, 224), device=DEVICE)
+            for _ in range(WARMUP_ITERATIONS):
+                model(batch)
+    if DEVICE.type == "cuda":
+        torch.cuda.synchronize()
+    logger.info(
+        "Model warm-up (batch sizes %s x%d) took %.2fs",
+        list(WARMUP_BATCH_SIZES), WARMUP_ITERATIONS, time.perf_counter() - started,
+    )
+
+
+class LoadedModel(NamedTuple):
+    version: str
+    model: nn.Module
+
+
+class ModelRegistry:
+    """
+    Holds the model this process serves. A new checkpoint is loaded and
+    warmed up off to the side and then swapped in with one reference
+    assignment. Requests that already fetched the old ``LoadedModel`` finish
+    on it; the old model is freed when the last of them drops it.
+    """
+
+    def __init__(self):
+        self._active: Optional[LoadedModel] = None
+        # Version served on our behalf by the worker pool, when there is one
+        self._pool_version: Optional[str] = None
+        self._load_lock = threading.Lock()
+
+    def get(self) -> LoadedModel:
+        """The active model, loading the current checkpoint on first use."""
+        active = self._active
+        if active is None:
+            with self._load_lock:
+                if self._active is None:
+                    self._active = self.load()
+                active = self._active
+        return active
+
+    def serving_version(self) -> str:
+        """Version that answers predictions right now (in this process or its worker pool)."""
+        if self._pool_version is not None:
+            return self._pool_version
+        return self.get().version
+
+    def set_pool_version(self, version: Optional[str]) -> None:
+        self._pool_version = version
+
+    def load(self, version: Optional[str] = None) -> LoadedModel:
+        """Load and warm up a checkpoint without serving it."""
+        version = version or model_version()
+        started = time.perf_counter()
+        model = _build_model()
+        _warm_up(model)
+        logger.info("Model %s loaded and warmed up in %.2fs", version, time.perf_counter() - started)
+        return LoadedModel(version, model)
+
+    def swap(self, loaded: LoadedModel) -> Optional[str]:
+        """Serve ``loaded`` from now on. Returns the version it replaced."""
+        with self._load_lock:
+            previous, self._active = self._active, loaded
+        return previous.version if previous else None
+
+
+model_registry = ModelRegistry()
+
+
 def _load_model():
+    """Return the model this process is serving."""
+    return model_registry.get().model
+
+
+def _load_fp32_model() -> nn.Module:
     """
-    Load the model once. Works with either a full serialized model or a
+    Load the fp32 model. Works with either a full serialized model or a
     state_dict saved from the FL server.
     """
     if not MODEL_PATH.exists():
         raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
 
+    # Imported here so serving from a compiled artifact never needs the model class
+    from torch.serialization import add_safe_globals
+    from app.ml.mobilenetv3 import get_model, MobileNetV3Classifier
+
     # Allowlist our model class in case the checkpoint is a full serialized model
     add_safe_globals([MobileNetV3Classifier])
 
@@ -91,58 +309,96 @@ def _load_model():
     return model
 
 
-def _postprocess_output(output: torch.Tensor) -> Dict[str, Union[str, float]]:
+def _postprocess_output(output: torch.Tensor) -> List[Dict[str, Union[str, float]]]:
     """
-    Convert model raw output to label/confidence.
+    Convert model raw output to one label/confidence dict per batch row.
     Supports:
     - shape [B, C] logits (softmax)
     - shape [B] logits (sigmoid for binary)
     """
-    if output.ndim == 1:
-        output = output.unsqueeze(0)
-
     if isinstance(output, (list, tuple)):
         output = output[0]
         if isinstance(output, (list, tuple)):
             output = output[0]
 
+    if output.ndim == 1:
+        output = output.unsqueeze(0)
+
     if output.ndim != 2:
         raise RuntimeError(f"Unexpected model output shape: {tuple(output.shape)}")
 
+    results = []
     if output.shape[1] == 1:
-        probs = torch.sigmoid(output)
-        conf = probs[0, 0].item()
-        label_idx = 1 if conf >= 0.5 else 0
-        confidence = conf if label_idx == 1 else 1 - conf
+        probs = torch.sigmoid(output[:, 0]).tolist()
+        for conf in probs:
+            label_idx = 1 if conf >= 0.5 else 0
+            confidence = conf if label_idx == 1 else 1 - conf
+            results.append((label_idx, confidence))
     else:
         probs = torch.softmax(output, dim=1)
         conf_val, idx_val = torch.max(probs, dim=1)
-        label_idx = int(idx_val[0].item())
-        confidence = float(conf_val[0].item())
+        results = list(zip(idx_val.tolist(), conf_val.tolist()))
 
-    label = IDX_TO_LABEL.get(label_idx, str(label_idx))
-    return {"label": label, "confidence": round(confidence, 4)}
+    return [
+        {"label": IDX_TO_LABEL.get(int(idx), str(idx)), "confidence": round(float(conf), 4)}
+        for idx, conf in results
+    ]
 
 
-def predict(image_path: str) -> str:
+def _load_tensor(
+    image_path: str, out: Optional[torch.Tensor] = None, draft: bool = JPEG_DRAFT_ENABLED
+) -> torch.Tensor:
     """
-    Run inference on an image path and return a JSON string payload
-    to match the existing API schema.
+    Decode an image file and preprocess it for the model (shape [3, 224, 224]),
+    optionally writing into ``out``. Equivalent to ``_transform`` within
+    ``preprocess.PARITY_TOLERANCE``. Always decodes; tensor sidecars are not used.
     """
-    model = _load_model()
+    batch_out = out.unsqueeze(0) if out is not None else None
+    return preprocess_paths([image_path], batch_out, draft, use_cache=False)[0]
 
-    img = Image.open(image_path).convert("RGB")
-    tensor = _transform(img).unsqueeze(0).to(DEVICE)
 
+class Prediction(NamedTuple):
+    result: Dict[str, Union[str, float]]
+    model_version: str
+    # Seconds per stage for the whole batch this prediction was part of (shared by its rows)
+    timings: Optional[Dict[str, float]] = None
+
+
+def predict_batch(image_paths: Sequence[str]) -> List[Prediction]:
+    """
+    Run a single forward pass over several images and return one
+    prediction per path, in input order.
+    """
+    if not image_paths:
+        return []
+    version, model = model_registry.get()
+
+    timings: Dict[str, float] = {}
+    batch = preprocess_paths(image_paths, timings=timings).to(DEVICE)
+
+    started = time.perf_counter()
     with torch.no_grad():
-        output = model(tensor)
-    # Debug: log raw model output shape and a small sample
-    try:
-        sample_vals = output[0].detach().cpu().numpy().tolist()
-        logger.info("Model raw output shape: %s sample: %s", tuple(output.shape), sample_vals[:5])
-    except Exception as exc:  # pragma: no cover - debug logging
-        logger.warning("Unable to log raw output sample: %s", exc)
-
-    result = _postprocess_output(output)
-    logger.info("Postprocessed inference result: %s", result)
-    return json.dumps(result)
+        output = model(batch)
+    if DEVICE.type == "cuda":
+        torch.cuda.synchronize()
+    timings["forward"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = _postprocess_output(output)
+    timings["postprocess"] = time.perf_counter() - started
+
+    if DEBUG_LOG_SAMPLE_RATE > 0 and random.random() < DEBUG_LOG_SAMPLE_RATE:
+        logger.info(
+            "Sampled inference: %d image(s), raw output shape %s, first row %s, results %s, timings %s",
+            len(image_paths), tuple(output.shape), output[0].detach().cpu().tolist()[:5], results,
+            {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()},
+        )
+    return [Prediction(result, version, timings) for result in results]
+
+
+def predict(image_path: str) -> str:
+    """
+    Run inference on an image path and return a JSON string payload
+    to match the existing API schema.
+    """
+    return json.dumps(predict_batch([image_path])[0].result)
@@ -0,0 +1,84 @@
+"""
+Per-stage latency and request metrics for the prediction path.
+
+Worker-side stages (``read`` of tensor sidecars, ``decode`` including the
+file open, ``transform``, ``forward``, ``postprocess``) are timed inside
+``predict_batch`` and travel back with each ``Prediction``;
+``run_inference`` records them once per batch, so they are counted the
+same with threads or the process pool. Request-side stages
+(``db_read``, ``cache_lookup``, ``inference``, ``db_write``) are timed in
+the routers with ``timed``. Everything is exposed on ``GET /metrics``.
+"""
+
+import time
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Sequence
+
+from app.ml.inference import Prediction, predict_batch
+from app.ml.worker_pool import run_in_pool
+from app.utils.metrics import counter, gauge, histogram
+
+INFERENCE_STAGE_HISTOGRAM = histogram(
+    "inference_stage_seconds",
+    "Time per inference stage for one batch",
+    labelnames=("stage",),
+)
+REQUEST_STAGE_HISTOGRAM = histogram(
+    "prediction_request_stage_seconds",
+    "Time per stage of a prediction request",
+    labelnames=("stage",),
+)
+REQUESTS_COUNTER = counter(
+    "prediction_requests_total",
+    "Prediction requests received",
+    labelnames=("endpoint",),
+)
+ERRORS_COUNTER = counter(
+    "prediction_errors_total",
+    "Prediction failures by stage; inference_batch counts failed executor batches",
+    labelnames=("stage",),
+)
+EXECUTOR_QUEUE_GAUGE = gauge(
+    "inference_executor_queue_depth",
+    "Inference batches submitted to the executor and not yet finished",
+)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Observe the duration of the block as request stage ``stage``; count it as an error if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS_COUNTER.labels(stage=stage).inc()
+        raise
+    finally:
+        REQUEST_STAGE_HISTOGRAM.labels(stage=stage).observe(time.perf_counter() - started)
+
+
+def observe_predictions(predictions: Sequence[Prediction]) -> None:
+    """Record the worker stage timings of a batch (shared by all its predictions) once."""
+    seen = set()
+    for prediction in predictions:
+        timings = getattr(prediction, "timings", None)
+        if not timings or id(timings) in seen:
+            continue
+        seen.add(id(timings))
+        for stage, seconds in timings.items():
+            INFERENCE_STAGE_HISTOGRAM.labels(stage=stage).observe(seconds)
+
+
+async def run_inference(image_paths: Sequence[str], executor: Optional[Executor] = None) -> List[Prediction]:
+    """``predict_batch`` on ``executor``, tracked in the queue-depth gauge and stage histograms."""
+    EXECUTOR_QUEUE_GAUGE.inc()
+    try:
+        predictions = await run_in_pool(executor, predict_batch, list(image_paths))
+    except Exception:
+        ERRORS_COUNTER.labels(stage="inference_batch").inc()
+        raise
+    finally:
+        EXECUTOR_QUEUE_GAUGE.dec()
+    observe_predictions(predictions)
+    return predictions
@@ -0,0 +1,261 @@
+"""
+Bounded in-process queue for asynchronous prediction jobs.
+
+``POST /image/predict/{image_id}?async=true`` enqueues a job and answers
+``202`` immediately instead of holding the connection open while inference
+runs. A fixed number of consumer tasks drain the queue. When it is full,
+new jobs are refused (the endpoint answers ``503``) so bursts turn into
+fast rejections instead of piled-up connections. Job state lives on the
+``images`` document under ``job``. Local listeners (the SSE endpoint) are
+woken on every state change and otherwise poll the document, so they also
+work when the job runs in another uvicorn worker.
+
+The queue itself is in memory. Each job records the process that owns it
+(``job.owner``), which renews ``job.heartbeat_at`` every
+``JOB_HEARTBEAT_SECONDS`` while the job is waiting or running. On
+shutdown, jobs still waiting or running are marked failed. At startup and
+then every ``PREDICTION_JOB_LEASE_SECONDS``, each process takes over
+active jobs whose heartbeat is older than the lease, i.e. whose owner died
+without finishing them: they are claimed and queued again (or failed if the
+queue is full), so no job stays non-terminal forever. Jobs of live sibling
+workers are left alone.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.database import get_database
+from app.utils.metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUE_MAX_SIZE = int(os.getenv("PREDICTION_JOB_QUEUE_SIZE", "256"))
+JOB_WORKERS = int(os.getenv("PREDICTION_JOB_WORKERS", "4"))
+# An active job whose heartbeat is older than this is considered abandoned
+JOB_LEASE_SECONDS = int(os.getenv("PREDICTION_JOB_LEASE_SECONDS", "60"))
+JOB_HEARTBEAT_SECONDS = JOB_LEASE_SECONDS / 4
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+TERMINAL_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+ACTIVE_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+# Fields the handler needs to re-run a recovered job (and to tell whether its result changed)
+RECOVERY_PROJECTION = {
+    "_id": 0, "image_id": 1, "user_id": 1, "image_path": 1, "content_sha256": 1, "result": 1, "model_version": 1, "job": 1,
+}
+
+JOB_QUEUE_GAUGE = gauge("prediction_job_queue_depth", "Prediction jobs waiting for a consumer")
+
+# Identifies this process as the owner of the jobs it queues
+_OWNER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def job_state(job_id: str, status: str, error: Optional[str] = None) -> Dict:
+    """Value stored under ``images.job``; every state change is made by the owning process."""
+    now = datetime.utcnow()
+    return {
+        "job_id": job_id,
+        "status": status,
+        "error": error,
+        "owner": _OWNER_ID,
+        "heartbeat_at": now,
+        "updated_at": now,
+    }
+
+
+class JobQueue:
+    def __init__(
+        self,
+        handler: Callable[[str, Dict], Awaitable[None]],
+        maxsize: int = JOB_QUEUE_MAX_SIZE,
+        workers: int = JOB_WORKERS,
+    ):
+        self.handler = handler
+        self.maxsize = maxsize
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._pending: Set[str] = set()
+        self._running: Dict[str, Dict] = {}
+        self._listeners: Dict[str, Set[asyncio.Event]] = {}
+
+    def full(self) -> bool:
+        return self._queue is None or self._queue.full()
+
+    def qsize(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def job_ids(self) -> List[str]:
+        """Jobs waiting or running in this process."""
+        return [*self._pending, *self._running]
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+
+    async def stop(self) -> List[Tuple[str, Dict]]:
+        """Cancel the consumers. Returns the jobs that were waiting or running, as (job_id, payload)."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        unfinished = list(self._running.items())
+        self._running.clear()
+        while self._queue is not None and not self._queue.empty():
+            unfinished.append(self._queue.get_nowait())
+        self._pending.clear()
+        self._queue = None
+        return unfinished
+
+    def enqueue(self, job_id: str, payload: Dict) -> None:
+        """Queue a job; raises ``asyncio.QueueFull`` when at capacity."""
+        if self._queue is None:
+            raise asyncio.QueueFull
+        self._queue.put_nowait((job_id, payload))
+        self._pending.add(job_id)
+
+    async def _consume(self) -> None:
+        while True:
+            job_id, payload = await self._queue.get()
+            self._pending.discard(job_id)
+            self._running[job_id] = payload
+            try:
+                await self.handler(job_id, payload)
+            except Exception:
+                logger.exception("Prediction job %s crashed", job_id)
+            # Not in a finally: a job cancelled by stop() must stay in _running so it is reported
+            self._running.pop(job_id, None)
+            self._queue.task_done()
+            self.notify(job_id)
+
+    def listen(self, job_id: str) -> asyncio.Event:
+        event = asyncio.Event()
+        self._listeners.setdefault(job_id, set()).add(event)
+        return event
+
+    def unlisten(self, job_id: str, event: asyncio.Event) -> None:
+        listeners = self._listeners.get(job_id)
+        if listeners is not None:
+            listeners.discard(event)
+            if not listeners:
+                del self._listeners[job_id]
+
+    def notify(self, job_id: str) -> None:
+        for event in self._listeners.get(job_id, ()):
+            event.set()
+
+
+_job_queue: Optional[JobQueue] = None
+_lease_task: Optional[asyncio.Task] = None
+JOB_QUEUE_GAUGE.set_function(lambda: _job_queue.qsize() if _job_queue else 0)
+
+
+async def _fail_job(image_id: str, job_id: str, error: str, match: Optional[Dict] = None) -> bool:
+    db = get_database()
+    result = await db.images.update_one(
+        {"image_id": image_id, "job.job_id": job_id, "job.status": {"$in": list(ACTIVE_STATES)}, **(match or {})},
+        {"$set": {"job": job_state(job_id, JOB_FAILED, error)}}
+    )
+    return result.modified_count > 0
+
+
+async def recover_jobs(queue: JobQueue) -> None:
+    """
+    Re-queue active jobs whose owner stopped renewing their lease; fail
+    those that do not fit in the queue. Each job is claimed with a
+    conditional update on the heartbeat it was found with, so when several
+    workers sweep at once only one of them picks it up.
+    """
+    db = get_database()
+    requeued = failed = 0
+    expired = datetime.utcnow() - timedelta(seconds=JOB_LEASE_SECONDS)
+    # $exists keeps the scan on the sparse job_id index
+    cursor = db.images.find(
+        {
+            "job.job_id": {"$exists": True},
+            "job.status": {"$in": list(ACTIVE_STATES)},
+            "$or": [{"job.heartbeat_at": {"$lt": expired}}, {"job.heartbeat_at": {"$exists": False}}],
+        },
+        RECOVERY_PROJECTION
+    )
+    async for image in cursor:
+        job = image["job"]
+        # A missing heartbeat_at (jobs queued before leases existed) matches None
+        claim = {"job.status": job["status"], "job.heartbeat_at": job.get("heartbeat_at")}
+        if queue.full():
+            if await _fail_job(image["image_id"], job["job_id"], "Prediction queue was full after a restart", claim):
+                failed += 1
+            continue
+        claimed = await db.images.update_one(
+            {"image_id": image["image_id"], "job.job_id": job["job_id"], **claim},
+            {"$set": {"job": job_state(job["job_id"], JOB_QUEUED)}}
+        )
+        if claimed.modified_count:
+            queue.enqueue(job["job_id"], image)
+            requeued += 1
+    if requeued or failed:
+        logger.warning("Recovered unfinished prediction jobs: %d re-queued, %d failed", requeued, failed)
+
+
+async def _renew_leases(queue: JobQueue) -> None:
+    job_ids = queue.job_ids()
+    if not job_ids:
+        return
+    db = get_database()
+    await db.images.update_many(
+        {"job.job_id": {"$in": job_ids}, "job.owner": _OWNER_ID, "job.status": {"$in": list(ACTIVE_STATES)}},
+        {"$set": {"job.heartbeat_at": datetime.utcnow()}}
+    )
+
+
+async def _maintain_leases(queue: JobQueue) -> None:
+    """Renew this process's leases; every lease period, take over jobs whose lease expired."""
+    loop = asyncio.get_running_loop()
+    next_sweep = loop.time() + JOB_LEASE_SECONDS
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            await _renew_leases(queue)
+            if loop.time() >= next_sweep:
+                next_sweep = loop.time() + JOB_LEASE_SECONDS
+                await recover_jobs(queue)
+        except Exception:
+            logger.exception("Prediction job lease maintenance failed")
+
+
+async def start_job_queue(handler: Callable[[str, Dict], Awaitable[None]]) -> None:
+    global _job_queue, _lease_task
+    _job_queue = JobQueue(handler)
+    await _job_queue.start()
+    await recover_jobs(_job_queue)
+    _lease_task = asyncio.create_task(_maintain_leases(_job_queue))
+
+
+async def stop_job_queue() -> None:
+    global _job_queue, _lease_task
+    if _lease_task is not None:
+        _lease_task.cancel()
+        await asyncio.gather(_lease_task, return_exceptions=True)
+        _lease_task = None
+    if _job_queue:
+        queue, _job_queue = _job_queue, None
+        unfinished = await queue.stop()
+        for job_id, payload in unfinished:
+            try:
+                await _fail_job(payload["image_id"], job_id, "Server shut down before the job finished")
+            except Exception:
+                logger.exception("Failed to mark prediction job %s as failed", job_id)
+            queue.notify(job_id)
+        if unfinished:
+            logger.warning("Marked %d unfinished prediction jobs as failed on shutdown", len(unfinished))
+
+
+def get_job_queue() -> Optional[JobQueue]:
+    return _job_queue
@@ -0,0 +1,157 @@
+"""
+Prediction cache keyed on image content and model version.
+
+Identical image bytes always produce the same prediction from the same
+checkpoint, so results are cached under ``<model_version>:<sha256>``:
+
+- an in-process LRU tier answers repeat uploads without any I/O;
+- a Mongo tier (``prediction_cache`` collection) shares results across
+  workers and restarts.
+
+Because the model version is part of the key, publishing a new
+``global_model.pth`` invalidates every entry automatically; the LRU is
+cleared and stale Mongo entries are purged when a new version is seen.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from app.database import get_database
+from app.utils.metrics import counter
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("PREDICTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "4096"))
+
+CACHE_LOOKUPS_COUNTER = counter(
+    "prediction_cache_lookups_total",
+    "Prediction cache lookups by outcome (lru_hit, mongo_hit, miss)",
+    labelnames=("result",),
+)
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+
+    @staticmethod
+    def _key(content_sha256: str, model_version: str) -> str:
+        return f"{model_version}:{content_sha256}"
+
+    def _observe_version(self, model_version: str) -> None:
+        """Drop everything cached for older model versions the first time a new one shows up."""
+        if model_version == self._version:
+            return
+        with self._lock:
+            previous, self._version = self._version, model_version
+            self._entries.clear()
+        if previous is not None:
+            logger.info("Model version changed (%s -> %s); prediction cache invalidated", previous, model_version)
+            asyncio.create_task(self._purge_stale(model_version))
+
+    async def _purge_stale(self, model_version: str) -> None:
+        try:
+            db = get_database()
+            await db.prediction_cache.delete_many({"model_version": {"$ne": model_version}})
+        except Exception as exc:
+            logger.warning("Failed to purge stale prediction cache entries: %s", exc)
+
+    def _lru_get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+            return result
+
+    def _lru_put(self, key: str, result: Dict) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get(self, content_sha256: str, model_version: str) -> Optional[Dict]:
+        self._observe_version(model_version)
+        key = self._key(content_sha256, model_version)
+        result = self._lru_get(key)
+        if result is not None:
+            CACHE_LOOKUPS_COUNTER.labels(result="lru_hit").inc()
+            return result
+
+        db = get_database()
+        doc = await db.prediction_cache.find_one({"_id": key})
+        if doc is None:
+            CACHE_LOOKUPS_COUNTER.labels(result="miss").inc()
+            return None
+        CACHE_LOOKUPS_COUNTER.labels(result="mongo_hit").inc()
+        self._lru_put(key, doc["result"])
+        return doc["result"]
+
+    async def get_many(self, content_hashes: Iterable[str], model_version: str) -> Dict[str, Dict]:
+        """Bulk ``get``: LRU first, then one Mongo query for the rest. Returns {content_sha256: result} for hits."""
+        self._observe_version(model_version)
+        found: Dict[str, Dict] = {}
+        missing: Dict[str, str] = {}
+        for content_sha256 in dict.fromkeys(content_hashes):
+            key = self._key(content_sha256, model_version)
+            result = self._lru_get(key)
+            if result is not None:
+                found[content_sha256] = result
+            else:
+                missing[key] = content_sha256
+        CACHE_LOOKUPS_COUNTER.labels(result="lru_hit").inc(len(found))
+        if not missing:
+            return found
+
+        db = get_database()
+        docs = await db.prediction_cache.find(
+            {"_id": {"$in": list(missing)}}, {"result": 1}
+        ).to_list(length=len(missing))
+        for doc in docs:
+            self._lru_put(doc["_id"], doc["result"])
+            found[missing[doc["_id"]]] = doc["result"]
+        CACHE_LOOKUPS_COUNTER.labels(result="mongo_hit").inc(len(docs))
+        CACHE_LOOKUPS_COUNTER.labels(result="miss").inc(len(missing) - len(docs))
+        return found
+
+    async def put(self, content_sha256: str, model_version: str, result: Dict) -> None:
+        if self._version is not None and model_version != self._version:
+            # Produced by a model that has since been replaced (or not yet observed); don't cache it
+            return
+        key = self._key(content_sha256, model_version)
+        self._lru_put(key, result)
+
+        db = get_database()
+        await db.prediction_cache.update_one(
+            {"_id": key},
+            {
+                "$set": {
+                    "content_sha256": content_sha256,
+                    "model_version": model_version,
+                    "result": result,
+                    "created_at": datetime.utcnow(),
+                }
+            },
+            upsert=True,
+        )
+
+
+prediction_cache = PredictionCache()
@@ -0,0 +1,171 @@
+"""
+Batched tensor preprocessing for inference.
+
+``_transform`` builds every image separately: PIL ``Resize``/``CenterCrop``,
+then ``ToTensor`` (a float copy), then ``Normalize`` (another float copy), and
+finally ``torch.stack`` copies everything once more into the batch. Here:
+
+1. each file is decoded (JPEGs at reduced DCT scale, see ``decode_image``)
+   and resized/cropped by Pillow, whose SIMD resampler is the fastest
+   antialiased resize available on the single-threaded CPU workers;
+2. the cropped uint8 pixels are copied (and converted) once, straight into
+   their row of the float output, which may be a caller-preallocated batch;
+3. the whole batch is normalized in place with one scale and one shift
+   (``x * 1/(255*std) - mean/std``). On CPU this beat a broadcasting
+   ``addcmul`` and allocates nothing.
+
+Output matches ``_transform`` to float rounding (``PARITY_TOLERANCE``). The
+normalization is not folded into the first conv: its zero padding would
+then pad with a different value and change border activations. Check with
+``python -m benchmarks.preprocess``.
+
+The preprocessed tensor of every uploaded image is also kept next to its
+file as a raw fp16 sidecar (``<image><TENSOR_SUFFIX>``, 294 KiB), written at
+upload time or on the first prediction. Later predictions and re-scoring
+memory-map it with ``torch.from_file`` and skip JPEG/PNG decoding entirely.
+The suffix encodes the preprocessing parameters, so changing them simply
+misses the old sidecars. fp16 storage moves normalized values by at most
+~1e-3, well below what changes a prediction.
+"""
+
+import logging
+import os
+import time
+import uuid
+from typing import BinaryIO, Dict, Optional, Sequence, Union
+
+import torch
+from PIL import Image
+from torchvision import transforms
+from torchvision.transforms import functional as F
+
+RESIZE_SIZE = 256
+CROP_SIZE = 224
+MEAN = (0.485, 0.456, 0.406)
+STD = (0.229, 0.224, 0.225)
+
+# Let libjpeg decode at 1/2, 1/4 or 1/8 scale when the image is still at least
+# RESIZE_SIZE on its short side, instead of decoding every pixel and discarding most
+JPEG_DRAFT_ENABLED = os.getenv("INFERENCE_JPEG_DRAFT", "true").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+
+_resize_crop = transforms.Compose([transforms.Resize(RESIZE_SIZE), transforms.CenterCrop(CROP_SIZE)])
+
+# ToTensor's 1/255 and Normalize(mean, std) folded into one scale and one shift
+_SCALE = (1.0 / (255.0 * torch.tensor(STD))).view(3, 1, 1)
+_BIAS = (-torch.tensor(MEAN) / torch.tensor(STD)).view(3, 1, 1)
+
+TENSOR_CACHE_ENABLED = os.getenv("PREPROCESSED_TENSOR_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+_TENSOR_NUMEL = 3 * CROP_SIZE * CROP_SIZE
+
+# Largest allowed element-wise difference from _transform on the same decoded image
+PARITY_TOLERANCE = 1e-5
+
+
+def decode_image(image: Union[str, BinaryIO], draft: bool = JPEG_DRAFT_ENABLED) -> Image.Image:
+    """Open an image (path or file object) as RGB, decoding JPEGs at the smallest DCT scale that covers RESIZE_SIZE."""
+    img = Image.open(image)
+    if draft and img.format == "JPEG":
+        # draft() only ever picks a scale that keeps both sides >= the requested size
+        img.draft("RGB", (RESIZE_SIZE, RESIZE_SIZE))
+    return img.convert("RGB")
+
+
+def normalize_(batch: torch.Tensor) -> torch.Tensor:
+    """In place: float pixels in 0-255 to ToTensor + Normalize output."""
+    return batch.mul_(_SCALE).add_(_BIAS)
+
+
+def preprocess_images(images: Sequence[Image.Image], out: Optional[torch.Tensor] = None) -> torch.Tensor:
+    """
+    Resize, crop and normalize RGB images into a ``[N, 3, 224, 224]`` float
+    batch. ``out`` may be a preallocated batch to fill.
+    """
+    if out is None:
+        out = torch.empty((len(images), 3, CROP_SIZE, CROP_SIZE))
+    for row, img in zip(out, images):
+        # uint8 -> float conversion happens in the copy, straight into the batch
+        row.copy_(F.pil_to_tensor(_resize_crop(img)))
+    return normalize_(out)
+
+
+def tensor_path(image_path: str, draft: bool = JPEG_DRAFT_ENABLED) -> str:
+    """Sidecar file holding the preprocessed fp16 tensor of ``image_path``."""
+    tag = f"r{RESIZE_SIZE}c{CROP_SIZE}{'d' if draft else ''}"
+    return f"{image_path}.{tag}.f16"
+
+
+def load_cached_tensor(image_path: str, draft: bool = JPEG_DRAFT_ENABLED) -> Optional[torch.Tensor]:
+    """Memory-map the fp16 sidecar of ``image_path`` as ``[3, 224, 224]``, or None if absent."""
+    path = tensor_path(image_path, draft)
+    try:
+        if os.path.getsize(path) != _TENSOR_NUMEL * 2:
+            return None
+    except OSError:
+        return None
+    # shared=False maps the file copy-on-write; nothing is read until the copy into the batch
+    return torch.from_file(path, shared=False, size=_TENSOR_NUMEL, dtype=torch.float16).view(3, CROP_SIZE, CROP_SIZE)
+
+
+def write_cached_tensor(image_path: str, tensor: torch.Tensor, draft: bool = JPEG_DRAFT_ENABLED) -> None:
+    """Store ``tensor`` as the fp16 sidecar of ``image_path`` (atomically)."""
+    path = tensor_path(image_path, draft)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        tensor.to(torch.float16).contiguous().numpy().tofile(tmp_path)
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        # Read-only or full disk: serving still works, just without the sidecar
+        logger.warning("Could not write preprocessed tensor %s: %s", path, exc)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def cache_tensor(image_path: str) -> None:
+    """Precompute the sidecar for ``image_path`` unless it already exists (e.g. deduplicated upload)."""
+    if not TENSOR_CACHE_ENABLED or os.path.exists(tensor_path(image_path)):
+        return
+    preprocess_paths([image_path])
+
+
+def _add_time(timings: Optional[Dict[str, float]], stage: str, started: float) -> float:
+    now = time.perf_counter()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + now - started
+    return now
+
+
+def preprocess_paths(
+    image_paths: Sequence[str],
+    out: Optional[torch.Tensor] = None,
+    draft: bool = JPEG_DRAFT_ENABLED,
+    use_cache: bool = TENSOR_CACHE_ENABLED,
+    timings: Optional[Dict[str, float]] = None,
+) -> torch.Tensor:
+    """
+    Preprocess image files into one normalized batch. With ``use_cache``,
+    rows come from fp16 sidecars where present, and images that had to be
+    decoded get a sidecar for next time. Seconds spent per stage (``read``
+    for sidecars, ``decode`` for opening and decoding files, ``transform``)
+    are added to ``timings`` when given.
+    """
+    if out is None:
+        out = torch.empty((len(image_paths), 3, CROP_SIZE, CROP_SIZE))
+
+    for index, path in enumerate(image_paths):
+        started = time.perf_counter()
+        cached = load_cached_tensor(path, draft) if use_cache else None
+        if cached is not None:
+            out[index].copy_(cached)
+            _add_time(timings, "read", started)
+            continue
+        # Decoded straight from the file: PIL reads only what it needs (less with draft), no extra copy
+        with open(path, "rb") as f:
+            img = decode_image(f, draft)
+        started = _add_time(timings, "decode", started)
+        preprocess_images([img], out[index:index + 1])
+        _add_time(timings, "transform", started)
+        if use_cache:
+            write_cached_tensor(path, out[index], draft)
+    return out
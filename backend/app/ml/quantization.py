@@ -0,0 +1,186 @@
+"""
+INT8 quantized serving for MobileNetV3Classifier (CPU only).
+
+- ``quantize_head_dynamic`` converts the ``nn.Linear`` classifier head to
+  dynamically quantized INT8 at load time (no calibration needed).
+- ``build_static_quantized_model`` applies FX graph-mode post-training
+  static quantization to the convolutional backbone, calibrated on a local
+  folder of sample tiles, and dynamically quantizes the head on top.
+- ``compare_models`` reports top-1 agreement and confidence drift of a
+  quantized model against the fp32 reference.
+
+Usage (from the backend directory):
+
+    python -m app.ml.quantization calibrate --calibration-dir data/tiles
+    python -m app.ml.quantization parity --mode static --images-dir data/holdout
+"""
+
+import argparse
+import copy
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+from app.ml.inference import (
+    MODEL_PATH,
+    STATIC_QUANTIZED_MODEL_PATH,
+    _load_fp32_model,
+    _postprocess_output,
+    checkpoint_sha256,
+    is_artifact_current,
+    load_script_artifact,
+    save_script_artifact,
+)
+from app.ml.preprocess import preprocess_paths
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".tif", ".tiff"}
+# Submodule left in float during static quantization; it is dynamically quantized instead
+HEAD_MODULE_NAME = "backbone.classifier"
+CALIBRATION_BATCH_SIZE = 16
+
+
+def list_images(folder: Path, limit: int = 0) -> List[Path]:
+    paths = sorted(p for p in Path(folder).rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if not paths:
+        raise FileNotFoundError(f"No images found under {folder}")
+    return paths[:limit] if limit > 0 else paths
+
+
+def _batches(paths: Sequence[Path], batch_size: int):
+    for start in range(0, len(paths), batch_size):
+        chunk = paths[start:start + batch_size]
+        # Calibration folders are datasets, not uploads; don't leave tensor sidecars in them
+        yield preprocess_paths([str(p) for p in chunk], use_cache=False)
+
+
+def quantize_head_dynamic(model: nn.Module) -> nn.Module:
+    """Return a copy of ``model`` with every float ``nn.Linear`` dynamically quantized to INT8."""
+    # quantize_dynamic copies, but .cpu()/.eval() would first change the caller's model in place
+    return quantize_dynamic(copy.deepcopy(model).cpu().eval(), {nn.Linear}, dtype=torch.qint8)
+
+
+def build_static_quantized_model(model: nn.Module, calibration_paths: Sequence[Path]) -> nn.Module:
+    """Post-training static quantization of the backbone, calibrated on ``calibration_paths``."""
+    engine = torch.backends.quantized.engine
+    qconfig_mapping = get_default_qconfig_mapping(engine).set_module_name(HEAD_MODULE_NAME, None)
+    float_model = copy.deepcopy(model).cpu().eval()
+    example = torch.randn(1, 3, 224, 224)
+    prepared = prepare_fx(float_model, qconfig_mapping, example_inputs=(example,))
+
+    with torch.no_grad():
+        for batch in _batches(calibration_paths, CALIBRATION_BATCH_SIZE):
+            prepared(batch)
+
+    quantized = convert_fx(prepared)
+    # The head stayed float above; quantize its Linear layers dynamically
+    quantize_dynamic(quantized, {nn.Linear}, dtype=torch.qint8, inplace=True)
+    logger.info("Static INT8 model calibrated on %d image(s) with %s engine", len(calibration_paths), engine)
+    return quantized
+
+
+def save_static_quantized_model(model: nn.Module, output_path: Path, source_sha256: str) -> None:
+    """Trace, freeze and save the quantized model so serving needs no FX/graph rebuild."""
+    example = torch.randn(1, 3, 224, 224)
+    with torch.no_grad():
+        scripted = torch.jit.freeze(torch.jit.trace(model, example).eval())
+    save_script_artifact(scripted, output_path, {"source_sha256": source_sha256})
+
+
+def load_static_quantized_model(path: Path = STATIC_QUANTIZED_MODEL_PATH) -> torch.jit.ScriptModule:
+    """Load the calibrated INT8 artifact, refusing one built from a different checkpoint."""
+    if not path.exists():
+        raise FileNotFoundError(
+            f"Static quantized model not found at {path}. "
+            "Run `python -m app.ml.quantization calibrate` first."
+        )
+    model, metadata = load_script_artifact(path, ("source_sha256",), map_location="cpu")
+    if not is_artifact_current(metadata):
+        raise RuntimeError(
+            f"{path} was calibrated from a different checkpoint than {MODEL_PATH}; "
+            "re-run `python -m app.ml.quantization calibrate`."
+        )
+    logger.info("✅ Static INT8 model loaded from %s", path)
+    return model
+
+
+def _timed_predictions(model: nn.Module, batches: List[torch.Tensor]):
+    results: List[Dict] = []
+    probs: List[torch.Tensor] = []
+    elapsed = 0.0
+    with torch.no_grad():
+        for batch in batches:
+            start = time.perf_counter()
+            output = model(batch)
+            elapsed += time.perf_counter() - start
+            results.extend(_postprocess_output(output))
+            probs.append(torch.softmax(output, dim=1))
+    return results, torch.cat(probs), elapsed
+
+
+def compare_models(reference: nn.Module, candidate: nn.Module, image_paths: Sequence[Path]) -> Dict[str, float]:
+    """Top-1 agreement, confidence drift and latency of ``candidate`` against ``reference``."""
+    batches = list(_batches(image_paths, CALIBRATION_BATCH_SIZE))
+    ref_results, ref_probs, ref_time = _timed_predictions(reference, batches)
+    cand_results, cand_probs, cand_time = _timed_predictions(candidate, batches)
+
+    n = len(ref_results)
+    agree = sum(r["label"] == c["label"] for r, c in zip(ref_results, cand_results))
+    drift = torch.tensor([abs(r["confidence"] - c["confidence"]) for r, c in zip(ref_results, cand_results)])
+    prob_drift = (ref_probs - cand_probs).abs().max(dim=1).values
+    return {
+        "images": n,
+        "top1_agreement": round(agree / n, 4),
+        "mean_confidence_drift": round(drift.mean().item(), 4),
+        "max_confidence_drift": round(drift.max().item(), 4),
+        "max_probability_drift": round(prob_drift.max().item(), 4),
+        "fp32_ms_per_image": round(ref_time * 1000 / n, 3),
+        "quantized_ms_per_image": round(cand_time * 1000 / n, 3),
+        "speedup": round(ref_time / cand_time, 2) if cand_time else 0.0,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="INT8 quantization tools for the serving model")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    calibrate = sub.add_parser("calibrate", help="Build the static INT8 artifact")
+    calibrate.add_argument("--calibration-dir", type=Path, required=True)
+    calibrate.add_argument("--max-images", type=int, default=256)
+    calibrate.add_argument("--output", type=Path, default=STATIC_QUANTIZED_MODEL_PATH)
+
+    parity = sub.add_parser("parity", help="Compare a quantized mode against fp32")
+    parity.add_argument("--mode", choices=("dynamic", "static"), required=True)
+    parity.add_argument("--images-dir", type=Path, required=True)
+    parity.add_argument("--max-images", type=int, default=0)
+    parity.add_argument("--artifact", type=Path, default=STATIC_QUANTIZED_MODEL_PATH)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    fp32_model = _load_fp32_model().cpu().eval()
+
+    if args.command == "calibrate":
+        paths = list_images(args.calibration_dir, args.max_images)
+        quantized = build_static_quantized_model(fp32_model, paths)
+        save_static_quantized_model(quantized, args.output, checkpoint_sha256(MODEL_PATH))
+        print(f"Saved static INT8 model to {args.output}")
+        print(json.dumps(compare_models(fp32_model, quantized, paths), indent=2))
+    else:
+        paths = list_images(args.images_dir, args.max_images)
+        if args.mode == "dynamic":
+            quantized = quantize_head_dynamic(fp32_model)
+        else:
+            quantized = load_static_quantized_model(args.artifact)
+        print(json.dumps(compare_models(fp32_model, quantized, paths), indent=2))
+
+
+if __name__ == "__main__":
+    main()
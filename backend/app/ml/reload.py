@@ -0,0 +1,126 @@
+"""
+Zero-downtime model reload.
+
+When the FL server publishes a new ``saved_models/global_model.pth``, the
+``ModelWatcher`` notices (or an admin calls ``POST /admin/model/reload``)
+and ``reload_model`` switches serving to it without a restart:
+
+- in-process serving: the checkpoint is loaded and warmed up on a thread,
+  then ``model_registry.swap`` makes it the active model in one step;
+- worker-pool serving: a fresh pool is started with the new checkpoint,
+  new work moves to it once every worker is warm, and the old pool drains
+  the work it already accepted before exiting.
+
+Requests in flight finish on the model they started with. Every stored
+prediction carries the version that produced it (``images.model_version``).
+"""
+
+import asyncio
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+from app.ml.batching import get_batcher
+from app.ml.inference import MODEL_PATH, model_registry, model_version
+from app.ml.worker_pool import get_worker_pool, recycle_worker_pool
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of saved_models/ for a new checkpoint; 0 disables the watcher
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL_SECONDS", "10"))
+
+_reload_lock: Optional[asyncio.Lock] = None
+
+
+async def reload_model(force: bool = False) -> Dict:
+    """
+    Serve the checkpoint currently on disk if it differs from the served one
+    (or unconditionally with ``force``). Concurrent calls are serialised.
+    """
+    global _reload_lock
+    if _reload_lock is None:
+        _reload_lock = asyncio.Lock()
+    loop = asyncio.get_running_loop()
+    async with _reload_lock:
+        previous = await loop.run_in_executor(None, model_registry.serving_version)
+        version = await loop.run_in_executor(None, model_version)
+        if version == previous and not force:
+            return {"reloaded": False, "model_version": version, "previous_version": previous}
+
+        logger.info("Reloading model: %s -> %s", previous, version)
+        if get_worker_pool() is not None:
+            version = await recycle_worker_pool()
+            batcher = get_batcher()
+            if batcher is not None:
+                # Batches dispatched from now on go to the new pool
+                batcher.executor = get_worker_pool()
+        else:
+            loaded = await loop.run_in_executor(None, model_registry.load, version)
+            model_registry.swap(loaded)
+        logger.info("Now serving model %s (was %s)", version, previous)
+        return {"reloaded": True, "model_version": version, "previous_version": previous}
+
+
+def _checkpoint_stat() -> Optional[Tuple[int, int]]:
+    try:
+        stat = MODEL_PATH.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ModelWatcher:
+    """Polls the checkpoint and reloads once a changed file has stopped changing."""
+
+    def __init__(self, interval: float = MODEL_WATCH_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _watch(self) -> None:
+        served = _checkpoint_stat()
+        pending = None
+        while True:
+            await asyncio.sleep(self.interval)
+            current = _checkpoint_stat()
+            if current is None or current == served:
+                pending = None
+                continue
+            if current != pending:
+                # Changed since the last poll; the file may still be being written
+                pending = current
+                continue
+            try:
+                await reload_model()
+                served = current
+            except Exception:
+                logger.exception("Model reload failed; still serving %s", model_registry.serving_version())
+                served = current  # don't retry the same broken file every interval
+            pending = None
+
+
+_watcher: Optional[ModelWatcher] = None
+
+
+async def start_model_watcher() -> None:
+    global _watcher
+    if MODEL_WATCH_INTERVAL <= 0:
+        return
+    _watcher = ModelWatcher()
+    _watcher.start()
+    logger.info("Watching %s for new checkpoints every %ss", MODEL_PATH, MODEL_WATCH_INTERVAL)
+
+
+async def stop_model_watcher() -> None:
+    global _watcher
+    if _watcher:
+        await _watcher.stop()
+        _watcher = None
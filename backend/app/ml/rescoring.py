@@ -0,0 +1,326 @@
+"""
+Bulk re-scoring of stored predictions after a new global model is published.
+
+A job refreshes every ``images`` document whose ``result`` was produced by
+an older model version:
+
+- the collection is streamed in ``image_id`` order, ``RESCORE_CHUNK_SIZE``
+  documents at a time, so memory stays flat however many images exist;
+- each chunk is deduplicated by content hash and run through
+  ``predict_batch`` in batches of ``RESCORE_BATCH_SIZE``, several at once
+  across the inference worker pool;
+- results from tiled inference (documents with a ``heatmap``) are re-run
+  through ``predict_tiled`` instead, one image at a time, and get their
+  heatmap replaced along with the result;
+- results are written back with one ``bulk_write`` per chunk, stamped with
+  the model version.
+
+Progress (``cursor``, counters, throughput) is stored in the
+``rescore_jobs`` collection after every chunk. There is one job per model
+version (``_id`` is the version), so starting it again resumes from the
+cursor, and a job whose owner stopped heartbeating can be taken over.
+
+Run it from the backend directory, or via ``POST /admin/rescore``:
+
+    python -m app.ml.rescoring run
+    python -m app.ml.rescoring status
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Union
+
+from pymongo import ReturnDocument, UpdateOne
+
+from app.database import get_database
+from app.ml.inference import Prediction, model_registry
+from app.ml.instrumentation import run_inference
+from app.ml.tiling import TiledPrediction, predict_tiled
+from app.ml.worker_pool import INFERENCE_WORKERS, get_worker_pool, run_in_pool
+from app.utils.history import bump_history_version
+from app.utils.storage import image_file_path
+
+logger = logging.getLogger(__name__)
+
+RESCORE_CHUNK_SIZE = int(os.getenv("RESCORE_CHUNK_SIZE", "512"))
+RESCORE_BATCH_SIZE = int(os.getenv("RESCORE_BATCH_SIZE", "64"))
+# Batches in flight at once; one per worker process keeps every worker busy
+RESCORE_CONCURRENCY = int(os.getenv("RESCORE_CONCURRENCY", str(max(1, INFERENCE_WORKERS))))
+# A running job whose heartbeat is older than this is considered abandoned
+RESCORE_LEASE_SECONDS = 120
+
+RESCORE_RUNNING = "running"
+RESCORE_PAUSED = "paused"
+RESCORE_SUCCEEDED = "succeeded"
+RESCORE_FAILED = "failed"
+# The served model changed while the job ran; a job for the new version supersedes it
+RESCORE_SUPERSEDED = "superseded"
+
+# heatmap.rows tells tiled results apart without loading the heatmap itself
+RESCORE_PROJECTION = {"_id": 0, "image_id": 1, "user_id": 1, "image_path": 1, "content_sha256": 1, "heatmap.rows": 1}
+
+# Identifies this process as the owner of the jobs it runs
+_OWNER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class ModelChanged(Exception):
+    pass
+
+
+async def _claim_job(version: str) -> Optional[Dict]:
+    """
+    Create the job for ``version`` or take it over (paused, failed or
+    abandoned). Returns None if it already finished or another live process
+    owns it.
+    """
+    db = get_database()
+    now = datetime.utcnow()
+    await db.rescore_jobs.update_one(
+        {"_id": version},
+        {"$setOnInsert": {
+            "model_version": version,
+            "status": RESCORE_PAUSED,
+            "cursor": None,
+            "total": await db.images.count_documents({"result": {"$ne": None}, "model_version": {"$ne": version}}),
+            "processed": 0,
+            "updated": 0,
+            "failed": 0,
+            "created_at": now,
+        }},
+        upsert=True,
+    )
+    return await db.rescore_jobs.find_one_and_update(
+        {
+            "_id": version,
+            "$or": [
+                {"status": {"$in": [RESCORE_PAUSED, RESCORE_FAILED]}},
+                {"status": RESCORE_RUNNING, "heartbeat_at": {"$lt": now - timedelta(seconds=RESCORE_LEASE_SECONDS)}},
+            ],
+        },
+        {"$set": {
+            "status": RESCORE_RUNNING,
+            "owner": _OWNER_ID,
+            "heartbeat_at": now,
+            "started_at": now,
+            "error": None,
+        }},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _run_batch(images: List[Dict]) -> List[Tuple[Dict, object]]:
+    """Predict one batch; a failing batch is retried image by image to isolate bad files."""
+    paths = [image_file_path(image["image_path"]) for image in images]
+    try:
+        predictions = await run_inference(paths, get_worker_pool())
+        return list(zip(images, predictions))
+    except Exception as e:
+        if len(images) == 1:
+            return [(images[0], e)]
+        results = []
+        for image in images:
+            results.extend(await _run_batch([image]))
+        return results
+
+
+async def _run_tiled(image: Dict) -> List[Tuple[Dict, object]]:
+    """Re-run tiled inference for one image whose result came from it."""
+    try:
+        return [(image, await run_in_pool(get_worker_pool(), predict_tiled, image_file_path(image["image_path"])))]
+    except Exception as e:
+        return [(image, e)]
+
+
+def _score_key(image: Dict) -> Tuple[bool, str]:
+    """Images with the same key share one prediction: same content, same mode (tiled or whole-image)."""
+    return bool(image.get("heatmap")), image.get("content_sha256") or image["image_id"]
+
+
+async def _score_chunk(images: List[Dict], version: str) -> Tuple[List[UpdateOne], int]:
+    """Run a chunk through the model. Returns (updates, failures)."""
+    # Identical content only needs one forward pass
+    by_content: Dict[Tuple[bool, str], List[Dict]] = {}
+    for image in images:
+        by_content.setdefault(_score_key(image), []).append(image)
+    unique = [group[0] for (is_tiled, _), group in by_content.items() if not is_tiled]
+    tiled = [group[0] for (is_tiled, _), group in by_content.items() if is_tiled]
+
+    semaphore = asyncio.Semaphore(RESCORE_CONCURRENCY)
+
+    async def run(scorer, arg):
+        async with semaphore:
+            return await scorer(arg)
+
+    batches = [unique[i:i + RESCORE_BATCH_SIZE] for i in range(0, len(unique), RESCORE_BATCH_SIZE)]
+    outcomes = [
+        pair
+        for result in await asyncio.gather(
+            *[run(_run_batch, b) for b in batches], *[run(_run_tiled, image) for image in tiled]
+        )
+        for pair in result
+    ]
+
+    updates = []
+    failed = 0
+    for representative, outcome in outcomes:
+        group = by_content[_score_key(representative)]
+        if isinstance(outcome, Exception):
+            logger.warning("Re-scoring image %s failed: %s", representative["image_id"], outcome)
+            failed += len(group)
+            continue
+        prediction: Union[Prediction, TiledPrediction] = outcome
+        if prediction.model_version != version:
+            raise ModelChanged(prediction.model_version)
+        update = {"result": json.dumps(prediction.result), "model_version": version}
+        if isinstance(prediction, TiledPrediction):
+            update["heatmap"] = prediction.heatmap
+        for image in group:
+            updates.append(UpdateOne({"image_id": image["image_id"]}, {"$set": update}))
+    return updates, failed
+
+
+async def run_rescore_job(version: Optional[str] = None) -> Optional[Dict]:
+    """
+    Re-score every stored result not produced by ``version`` (default: the
+    model being served now). Resumes from the stored cursor. Returns the
+    final job document, or None if the job was not claimable.
+    """
+    db = get_database()
+    version = version or await asyncio.get_running_loop().run_in_executor(None, model_registry.serving_version)
+    job = await _claim_job(version)
+    if job is None:
+        return None
+
+    cursor = job.get("cursor")
+    run_started = time.perf_counter()
+    run_processed = 0
+    logger.info("Re-scoring for model %s started at cursor %s", version, cursor)
+    try:
+        while True:
+            query = {"result": {"$ne": None}, "model_version": {"$ne": version}}
+            if cursor is not None:
+                query["image_id"] = {"$gt": cursor}
+            images = await db.images.find(query, RESCORE_PROJECTION).sort("image_id", 1).limit(RESCORE_CHUNK_SIZE).to_list(length=RESCORE_CHUNK_SIZE)
+            if not images:
+                break
+
+            updates, failed = await _score_chunk(images, version)
+            if updates:
+                await db.images.bulk_write(updates, ordered=False)
+                await bump_history_version(image["user_id"] for image in images)
+            cursor = images[-1]["image_id"]
+            run_processed += len(images)
+            elapsed = time.perf_counter() - run_started
+            job = await db.rescore_jobs.find_one_and_update(
+                {"_id": version, "owner": _OWNER_ID},
+                {
+                    "$set": {
+                        "cursor": cursor,
+                        "heartbeat_at": datetime.utcnow(),
+                        "images_per_sec": round(run_processed / elapsed, 2) if elapsed else None,
+                    },
+                    "$inc": {"processed": len(images), "updated": len(updates), "failed": failed},
+                },
+                return_document=ReturnDocument.AFTER,
+            )
+            if job is None:
+                logger.warning("Lost ownership of re-scoring job %s; stopping", version)
+                return None
+            logger.info(
+                "Re-scoring %s: %d/%d images (%d failed), %.1f images/s",
+                version, job["processed"], job["total"], job["failed"], job["images_per_sec"] or 0,
+            )
+    except asyncio.CancelledError:
+        await _finish(version, RESCORE_PAUSED)
+        raise
+    except ModelChanged as e:
+        logger.info("Model changed to %s during re-scoring for %s", e, version)
+        return await _finish(version, RESCORE_SUPERSEDED)
+    except Exception as e:
+        logger.exception("Re-scoring job %s failed", version)
+        return await _finish(version, RESCORE_FAILED, str(e))
+
+    return await _finish(version, RESCORE_SUCCEEDED)
+
+
+async def _finish(version: str, status: str, error: Optional[str] = None) -> Optional[Dict]:
+    db = get_database()
+    now = datetime.utcnow()
+    update = {"status": status, "error": error, "heartbeat_at": now}
+    if status in (RESCORE_SUCCEEDED, RESCORE_SUPERSEDED):
+        update["finished_at"] = now
+    return await db.rescore_jobs.find_one_and_update(
+        {"_id": version, "owner": _OWNER_ID},
+        {"$set": update},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def get_rescore_job(version: str) -> Optional[Dict]:
+    db = get_database()
+    return await db.rescore_jobs.find_one({"_id": version})
+
+
+_rescore_task: Optional[asyncio.Task] = None
+
+
+def start_rescore_task(version: Optional[str] = None) -> bool:
+    """Run a re-scoring job in the background of this process. False if one is already running here."""
+    global _rescore_task
+    if _rescore_task is not None and not _rescore_task.done():
+        return False
+    _rescore_task = asyncio.create_task(run_rescore_job(version))
+    return True
+
+
+async def stop_rescore_task() -> None:
+    """Pause the background job, if any; it resumes from its cursor next time."""
+    global _rescore_task
+    if _rescore_task is None:
+        return
+    task, _rescore_task = _rescore_task, None
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def _cli(command: str) -> None:
+    from app.database import close_mongo_connection, connect_to_mongo
+    from app.ml.worker_pool import start_worker_pool, stop_worker_pool
+
+    await connect_to_mongo()
+    try:
+        version = await asyncio.get_running_loop().run_in_executor(None, model_registry.serving_version)
+        if command == "status":
+            job = await get_rescore_job(version)
+        else:
+            await start_worker_pool()
+            try:
+                job = await run_rescore_job(version)
+            finally:
+                await stop_worker_pool()
+            if job is None:
+                job = await get_rescore_job(version)
+                print("Job already finished or owned by another process")
+    finally:
+        await close_mongo_connection()
+    print(json.dumps(job, indent=2, default=str))
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Re-score stored predictions with the current model")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("run", help="Run (or resume) the job for the current model version")
+    sub.add_parser("status", help="Show the job for the current model version")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_cli(args.command))
+
+
+if __name__ == "__main__":
+    main()
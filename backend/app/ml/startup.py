@@ -0,0 +1,99 @@
+"""
+Inference start-up phase and readiness.
+
+Uvicorn only starts accepting connections once the ASGI startup event
+returns, so the slow part of bringing inference up runs afterwards as a
+background task: spawning the worker pool (each worker loads and warms up
+the model), starting the micro-batcher, and, without a pool, eagerly
+loading and warming up the model in this process. ``GET /health`` answers
+``503`` until that task has finished, so load balancers only send traffic
+to warm workers.
+
+Requests that do reach the process early must not run inference either:
+with no pool or batcher yet, they would fall back to loading a model copy
+into the API process for good. Routes that predict depend on
+``require_inference_ready`` (``503`` with ``Retry-After`` until ready), and
+work that predicts on its own, such as recovering queued jobs, is started
+by the ``on_ready`` callback once start-up has finished.
+
+Set ``MODEL_EAGER_LOAD=false`` to skip the in-process load (the model then
+loads on the first prediction, as before) and report ready immediately.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException, status
+
+from app.ml.batching import start_batcher
+from app.ml.inference import model_registry
+from app.ml.reload import start_model_watcher
+from app.ml.worker_pool import get_worker_pool, start_worker_pool
+
+logger = logging.getLogger(__name__)
+
+MODEL_EAGER_LOAD = os.getenv("MODEL_EAGER_LOAD", "true").lower() in ("1", "true", "yes")
+
+_ready = False
+_error: Optional[str] = None
+_task: Optional[asyncio.Task] = None
+
+
+async def _prepare(on_ready: Optional[Callable[[], Awaitable[None]]]) -> None:
+    global _ready, _error
+    started = time.perf_counter()
+    try:
+        await start_worker_pool()
+        await start_batcher()
+        if MODEL_EAGER_LOAD and get_worker_pool() is None:
+            await asyncio.get_running_loop().run_in_executor(None, model_registry.get)
+        await start_model_watcher()
+    except Exception as e:
+        _error = str(e)
+        logger.exception("Inference start-up failed; /health will report unavailable")
+        return
+    _ready = True
+    logger.info("Inference ready in %.2fs", time.perf_counter() - started)
+    if on_ready is not None:
+        try:
+            await on_ready()
+        except Exception:
+            logger.exception("Post-start-up hook failed")
+
+
+def start_inference(on_ready: Optional[Callable[[], Awaitable[None]]] = None) -> None:
+    """Begin bringing inference up in the background; ``on_ready`` runs once it is up."""
+    global _task, _ready, _error
+    _ready, _error = False, None
+    _task = asyncio.create_task(_prepare(on_ready))
+
+
+async def cancel_inference_startup() -> None:
+    """Stop a start-up that is still running (e.g. shutdown during warm-up)."""
+    global _task, _ready
+    _ready = False
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+
+def inference_ready() -> bool:
+    return _ready
+
+
+def inference_error() -> Optional[str]:
+    return _error
+
+
+async def require_inference_ready() -> None:
+    """Route dependency: 503 until inference is up, instead of predicting in the API process."""
+    if not _ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Inference is unavailable" if _error else "Model is still loading, please retry shortly",
+            headers={"Retry-After": "5"},
+        )
@@ -0,0 +1,212 @@
+"""
+Tiled whole-slide inference.
+
+``_transform`` shrinks an entire slide to one 224x224 thumbnail, discarding
+most of the tissue. Tiled mode instead walks the image on a grid of
+``TILING_TILE_SIZE`` pixel tiles:
+
+1. the image is cut into tiles one at a time; a side shorter than one
+   tile gets a single tile padded with white background;
+2. background tiles are skipped with a cheap saturation-based tissue mask;
+3. tissue tiles are classified in batches of ``TILING_BATCH_SIZE``;
+4. per-class tile probabilities are averaged into a slide-level result and
+   a coarse per-tile heatmap.
+
+Uploads are PNG or JPEG, which PIL can only decode as a whole, so peak
+memory is the decoded RGB image (3 bytes per pixel, at most
+``TILING_MAX_PIXELS`` pixels: about 270 MB at the default) plus one batch
+of tiles. JPEGs above the limit are decoded at the reduced DCT scale that
+fits; PNGs above it are refused rather than exhausting memory.
+"""
+
+import logging
+import os
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import torch
+from PIL import Image, JpegImagePlugin
+from torchvision import transforms
+
+from app.ml.inference import DEVICE, IDX_TO_LABEL, model_registry
+from app.ml.preprocess import MEAN, STD
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = int(os.getenv("TILING_TILE_SIZE", "224"))
+TILE_BATCH_SIZE = int(os.getenv("TILING_BATCH_SIZE", "32"))
+# A tile counts as tissue when at least this fraction of its pixels is saturated
+TISSUE_FRACTION = float(os.getenv("TILING_TISSUE_FRACTION", "0.25"))
+TISSUE_SATURATION = 20  # 0-255 HSV saturation; glass/background sits well below this
+MAX_DECODED_PIXELS = int(os.getenv("TILING_MAX_PIXELS", str(Image.MAX_IMAGE_PIXELS)))
+MASK_SIZE = 32  # tissue detection runs on a MASK_SIZE x MASK_SIZE thumbnail of each tile
+BACKGROUND = (255, 255, 255)  # padding for images smaller than one tile, like bare glass
+JPEG_MAGIC = b"\xff\xd8\xff"
+MAX_DRAFT_SCALE = 8  # libjpeg decodes at 1/1, 1/2, 1/4 or 1/8 scale
+
+_tile_transform = transforms.Compose(
+    [
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=MEAN, std=STD),
+    ]
+)
+
+
+class TiledPrediction(NamedTuple):
+    result: Dict
+    heatmap: Dict
+    model_version: str
+
+
+def _draft_scale(size: Tuple[int, int]) -> int:
+    """Smallest power-of-two DCT scale whose decoded image fits in MAX_DECODED_PIXELS (may exceed MAX_DRAFT_SCALE)."""
+    width, height = size
+    scale = 1
+    # libjpeg rounds the scaled size up
+    while -(-width // scale) * -(-height // scale) > MAX_DECODED_PIXELS:
+        scale *= 2
+    return scale
+
+
+class _PILReader:
+    def __init__(self, image: Image.Image):
+        full_w, full_h = image.size
+        if full_w * full_h > MAX_DECODED_PIXELS:
+            if image.format != "JPEG":
+                raise ValueError(f"{full_w}x{full_h} {image.format} image exceeds TILING_MAX_PIXELS")
+            scale = _draft_scale(image.size)
+            if scale > MAX_DRAFT_SCALE:
+                raise ValueError(f"{full_w}x{full_h} JPEG is too large to tile even at 1/{MAX_DRAFT_SCALE} scale")
+            # draft() picks the largest scale that keeps both sides >= the requested size: exactly 1/scale here
+            image.draft("RGB", (max(1, full_w // scale), max(1, full_h // scale)))
+            if image.size[0] * image.size[1] > MAX_DECODED_PIXELS:
+                # Only for extreme aspect ratios, where one side is shorter than the scale
+                raise ValueError(f"{full_w}x{full_h} JPEG cannot be decoded within TILING_MAX_PIXELS")
+        self.image = image.convert("RGB")
+        self.size = self.image.size
+        # Tiles cover the same physical area whatever scale the JPEG was decoded at
+        self.scale = self.size[0] / full_w
+
+    def region(self, box: Tuple[int, int, int, int]) -> Image.Image:
+        return self.image.crop(box)
+
+    def close(self) -> None:
+        self.image.close()
+
+
+def _open_image(image_path: str) -> Image.Image:
+    with open(image_path, "rb") as f:
+        is_jpeg = f.read(len(JPEG_MAGIC)) == JPEG_MAGIC
+    if is_jpeg:
+        # Bypasses Image.open's decompression bomb check, which would refuse large JPEGs
+        # before draft() can shrink them; _PILReader bounds the decoded size instead
+        return JpegImagePlugin.JpegImageFile(image_path)
+    return Image.open(image_path)
+
+
+def _open_reader(image_path: str) -> _PILReader:
+    image = _open_image(image_path)
+    try:
+        return _PILReader(image)
+    except Exception:
+        image.close()
+        raise
+
+
+def is_tissue(tile: Image.Image) -> bool:
+    """Cheap tissue test: share of saturated pixels in a small thumbnail of the tile."""
+    thumb = tile.resize((MASK_SIZE, MASK_SIZE), Image.BILINEAR)
+    histogram = thumb.convert("HSV").getchannel("S").histogram()
+    saturated = sum(histogram[TISSUE_SATURATION:])
+    return saturated >= TISSUE_FRACTION * MASK_SIZE * MASK_SIZE
+
+
+def _grid_size(size: Tuple[int, int], tile_size: int) -> Tuple[int, int]:
+    """(rows, cols) of whole tiles; a side shorter than one tile still gets one (padded) tile."""
+    width, height = size
+    return max(1, height // tile_size), max(1, width // tile_size)
+
+
+def _tile_batches(
+    reader, tile_size: int, rows: int, cols: int
+) -> Iterator[Tuple[List[Tuple[int, int]], Optional[torch.Tensor]]]:
+    """Yield (grid positions, batch tensor) for tissue tiles, one bounded batch at a time."""
+    width, height = reader.size
+    positions: List[Tuple[int, int]] = []
+    tensors: List[torch.Tensor] = []
+    for row in range(rows):
+        top = row * tile_size
+        for col in range(cols):
+            left = col * tile_size
+            tile = reader.region((left, top, min(left + tile_size, width), min(top + tile_size, height)))
+            # Judge tissue on the real pixels only, then pad so every tile keeps the same scale
+            if not is_tissue(tile):
+                continue
+            if tile.size != (tile_size, tile_size):
+                padded = Image.new("RGB", (tile_size, tile_size), BACKGROUND)
+                padded.paste(tile, (0, 0))
+                tile = padded
+            positions.append((row, col))
+            tensors.append(_tile_transform(tile))
+            if len(tensors) == TILE_BATCH_SIZE:
+                yield positions, torch.stack(tensors)
+                positions, tensors = [], []
+    if tensors:
+        yield positions, torch.stack(tensors)
+
+
+def predict_tiled(image_path: str) -> TiledPrediction:
+    """Classify every tissue tile of an image and aggregate a slide-level prediction."""
+    version, model = model_registry.get()
+    reader = _open_reader(image_path)
+    try:
+        tile_size = max(1, round(TILE_SIZE * reader.scale))
+        rows, cols = _grid_size(reader.size, tile_size)
+        labels: List[List[Optional[str]]] = [[None] * cols for _ in range(rows)]
+        confidences: List[List[Optional[float]]] = [[None] * cols for _ in range(rows)]
+        prob_sum: Optional[torch.Tensor] = None
+        votes: Dict[str, int] = {}
+        tissue_tiles = 0
+
+        with torch.no_grad():
+            for positions, batch in _tile_batches(reader, tile_size, rows, cols):
+                probs = torch.softmax(model(batch.to(DEVICE)), dim=1).cpu()
+                prob_sum = probs.sum(dim=0) if prob_sum is None else prob_sum + probs.sum(dim=0)
+                conf_val, idx_val = torch.max(probs, dim=1)
+                for (row, col), idx, conf in zip(positions, idx_val.tolist(), conf_val.tolist()):
+                    label = IDX_TO_LABEL.get(idx, str(idx))
+                    labels[row][col] = label
+                    confidences[row][col] = round(conf, 4)
+                    votes[label] = votes.get(label, 0) + 1
+                tissue_tiles += len(positions)
+    finally:
+        reader.close()
+
+    if prob_sum is None:
+        raise ValueError("No tissue tiles found in image")
+
+    mean_probs = prob_sum / tissue_tiles
+    conf, idx = torch.max(mean_probs, dim=0)
+    result = {
+        "label": IDX_TO_LABEL.get(int(idx), str(int(idx))),
+        "confidence": round(float(conf), 4),
+        "mode": "tiled",
+        "tiles_total": rows * cols,
+        "tiles_tissue": tissue_tiles,
+        "class_probabilities": {
+            IDX_TO_LABEL.get(i, str(i)): round(float(p), 4) for i, p in enumerate(mean_probs.tolist())
+        },
+        "tile_votes": votes,
+    }
+    heatmap = {
+        "rows": rows,
+        "cols": cols,
+        "tile_size": TILE_SIZE,
+        "labels": labels,
+        "confidences": confidences,
+    }
+    logger.info(
+        "Tiled inference on %s: %d/%d tissue tiles -> %s",
+        image_path, tissue_tiles, rows * cols, result["label"],
+    )
+    return TiledPrediction(result, heatmap, version)
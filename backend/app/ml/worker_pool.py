@@ -0,0 +1,127 @@
+"""
+Dedicated inference worker processes.
+
+When ``INFERENCE_WORKERS`` is greater than zero, image decoding, the eval
+transform and the forward pass run in separate processes so they do not
+compete with the API process for the GIL. Each worker loads the checkpoint
+once in its initializer, pins its torch thread count and receives work as
+lists of image file paths. A new checkpoint is rolled out by replacing the
+whole pool (``recycle_worker_pool``); submit through ``run_in_pool`` so
+work that picked up the old pool just before the swap follows it to the
+new one.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+import torch
+
+from app.ml.inference import model_registry
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+INFERENCE_WORKER_THREADS = int(os.getenv("INFERENCE_WORKER_THREADS", "1"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _init_worker(num_threads: int) -> None:
+    """Runs once in every worker process before it accepts work."""
+    torch.set_num_threads(num_threads)
+    torch.set_num_interop_threads(1)
+    model_registry.get()
+    logger.info("Inference worker %d ready (torch threads=%d)", os.getpid(), num_threads)
+
+
+def _ping() -> str:
+    """Version of the model this worker serves."""
+    return model_registry.serving_version()
+
+
+async def _spawn_pool() -> Tuple[ProcessPoolExecutor, str]:
+    """Start a pool and wait until every worker has loaded and warmed up the model."""
+    pool = ProcessPoolExecutor(
+        max_workers=INFERENCE_WORKERS,
+        # spawn avoids forking torch/OpenMP state and the event loop's threads
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(INFERENCE_WORKER_THREADS,),
+    )
+    loop = asyncio.get_running_loop()
+    try:
+        # Workers are spawned on demand; submitting one task per slot brings them all up
+        versions = await asyncio.gather(*[loop.run_in_executor(pool, _ping) for _ in range(INFERENCE_WORKERS)])
+    except BaseException:
+        await loop.run_in_executor(None, pool.shutdown)
+        raise
+    if len(set(versions)) > 1:
+        # The checkpoint was replaced while workers were starting; try again
+        await loop.run_in_executor(None, pool.shutdown)
+        return await _spawn_pool()
+    return pool, versions[0]
+
+
+async def start_worker_pool() -> None:
+    """Spawn the worker processes and wait until every one has loaded the model."""
+    global _pool
+    if INFERENCE_WORKERS <= 0 or _pool is not None:
+        return
+    _pool, version = await _spawn_pool()
+    model_registry.set_pool_version(version)
+    logger.info(
+        "Started %d inference worker process(es) with %d torch thread(s) each, serving model %s",
+        INFERENCE_WORKERS,
+        INFERENCE_WORKER_THREADS,
+        version,
+    )
+
+
+async def recycle_worker_pool() -> Optional[str]:
+    """
+    Replace the workers with a fresh pool serving the current checkpoint.
+    New work goes to the new pool as soon as it is ready; the old pool
+    finishes what it already accepted and then exits. Returns the new version.
+    """
+    global _pool
+    if _pool is None:
+        return None
+    new_pool, version = await _spawn_pool()
+    old_pool, _pool = _pool, new_pool
+    model_registry.set_pool_version(version)
+    logger.info("Inference worker pool recycled; now serving model %s", version)
+    await asyncio.get_running_loop().run_in_executor(None, old_pool.shutdown)
+    return version
+
+
+async def stop_worker_pool() -> None:
+    global _pool
+    if _pool is None:
+        return
+    pool, _pool = _pool, None
+    model_registry.set_pool_version(None)
+    await asyncio.get_running_loop().run_in_executor(None, pool.shutdown)
+
+
+def get_worker_pool() -> Optional[ProcessPoolExecutor]:
+    return _pool
+
+
+def run_in_pool(executor: Optional[Executor], fn: Callable, *args: Any) -> asyncio.Future:
+    """
+    ``loop.run_in_executor(executor, fn, *args)``, except that if ``executor``
+    is a worker pool ``recycle_worker_pool`` has already shut down, the call
+    goes to the pool that replaced it instead of raising ``RuntimeError``.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return loop.run_in_executor(executor, fn, *args)
+    except RuntimeError:
+        # Raised by submit(), before anything ran; fn errors surface when the future is awaited
+        if executor is None or _pool is None or executor is _pool:
+            raise
+        return loop.run_in_executor(_pool, fn, *args)
@@ -12,6 +12,12 @@ from .image import (
     ImageBase,
     ImageCreate,
     ImageInDB,
-    ImageResponse
+    ImageResponse,
+    TileHeatmap,
+    TiledImageResponse,
+    BatchPredictRequest,
+    BatchPredictItem,
+    BatchPredictResponse,
+    RescoreJobResponse
 )
 
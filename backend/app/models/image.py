@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class ImageBase(BaseModel):
     image_path: str
@@ -22,7 +22,50 @@ class ImageResponse(BaseModel):
     upload_date: datetime
     image_path: str
     result: Optional[str] = None
+    model_version: Optional[str] = None
 
     class Config:
         from_attributes = True
 
+class TileHeatmap(BaseModel):
+    rows: int
+    cols: int
+    tile_size: int
+    labels: List[List[Optional[str]]]
+    confidences: List[List[Optional[float]]]
+
+class TiledImageResponse(ImageResponse):
+    heatmap: Optional[TileHeatmap] = None
+
+# Upper bound on image ids accepted by POST /image/predict/batch
+BATCH_PREDICT_MAX_IMAGES = 256
+
+class BatchPredictRequest(BaseModel):
+    image_ids: List[str] = Field(..., min_items=1, max_items=BATCH_PREDICT_MAX_IMAGES)
+
+class BatchPredictItem(BaseModel):
+    image_id: str
+    result: Optional[str] = None
+    model_version: Optional[str] = None
+    cached: bool = False
+    error: Optional[str] = None
+
+class BatchPredictResponse(BaseModel):
+    results: List[BatchPredictItem]
+    total_ms: float
+    inference_ms: float
+
+class RescoreJobResponse(BaseModel):
+    model_version: str
+    status: str
+    cursor: Optional[str] = None
+    total: int
+    processed: int
+    updated: int
+    failed: int
+    images_per_sec: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,94 @@
+from fastapi import APIRouter, HTTPException, Depends, Header, status
+from fastapi.responses import JSONResponse
+from typing import Optional
+import asyncio
+import hmac
+import os
+from app.models.image import RescoreJobResponse
+from app.ml.inference import model_registry, model_version
+from app.ml.reload import reload_model
+from app.ml.rescoring import get_rescore_job, start_rescore_task, stop_rescore_task
+from app.ml.startup import require_inference_ready
+
+router = APIRouter()
+
+# Shared secret for operational endpoints; they are disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow the request only with a matching X-Admin-Token header"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Not Found"
+        )
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin token"
+        )
+
+async def _current_version() -> str:
+    return await asyncio.get_running_loop().run_in_executor(None, model_registry.serving_version)
+
+@router.get("/model", dependencies=[Depends(require_admin)])
+async def get_model_status():
+    """Version being served and version of the checkpoint on disk"""
+    loop = asyncio.get_running_loop()
+    return {
+        "model_version": await _current_version(),
+        "checkpoint_version": await loop.run_in_executor(None, model_version),
+    }
+
+@router.post("/model/reload", dependencies=[Depends(require_admin), Depends(require_inference_ready)])
+async def reload_serving_model(force: bool = False):
+    """Load the checkpoint on disk in the background and swap it in without dropping requests"""
+    try:
+        return await reload_model(force=force)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Model reload failed: {str(e)}"
+        )
+
+@router.post(
+    "/rescore",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require_admin), Depends(require_inference_ready)]
+)
+async def start_rescore():
+    """Re-score all stored predictions with the current model (resumes an interrupted job)"""
+    version = await _current_version()
+    started = start_rescore_task(version)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "model_version": version,
+            "started": started,
+            "status_url": f"/admin/rescore/{version}",
+        },
+    )
+
+@router.get(
+    "/rescore/{version}",
+    response_model=RescoreJobResponse,
+    dependencies=[Depends(require_admin)]
+)
+async def get_rescore_status(version: str):
+    """Progress and throughput of the re-scoring job for a model version"""
+    job = await get_rescore_job(version)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Re-scoring job not found"
+        )
+    return RescoreJobResponse(**job)
+
+@router.delete(
+    "/rescore",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(require_admin)]
+)
+async def pause_rescore():
+    """Pause the re-scoring job running in this worker; it resumes from its cursor"""
+    await stop_rescore_task()
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Query
+from fastapi import APIRouter, HTTPException, Depends, status, Query, BackgroundTasks
 from fastapi.security import OAuth2PasswordBearer
 from datetime import datetime, timedelta
 import uuid
 from urllib.parse import unquote
+from pymongo.errors import DuplicateKeyError
 from app.models.user import (
     SignupRequest,
     UserResponse,
@@ -11,8 +12,8 @@ from app.models.user import (
 )
 from app.database import get_database
 from app.utils.auth import (
-    verify_password,
-    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
     verify_token,
     generate_verification_token,
@@ -21,6 +22,7 @@ from app.utils.auth import (
 )
 from app.utils.email import send_verification_email
 from app.utils.places import fetch_nearby_doctors
+from app.utils.user_cache import USER_CACHE_ENABLED, user_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -72,6 +74,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             detail="Invalid authentication credentials. Please login again.",
         )
     
+    if USER_CACHE_ENABLED:
+        cached = user_cache.get(user_id, token)
+        if cached is not None:
+            return cached
+    
     db = get_database()
     user = await db.users.find_one({"user_id": user_id})
     if user is None:
@@ -80,10 +87,33 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             detail="User not found",
         )
     
-    return UserResponse(**user)
+    current_user = UserResponse(**user)
+    if USER_CACHE_ENABLED:
+        user_cache.put(user_id, token, current_user)
+    return current_user
+
+# Unique indexes (see app/database.py) and the message each violation maps to
+DUPLICATE_USER_MESSAGES = {
+    "email": "Email already registered",
+    "username": "Username already taken",
+}
+
+def _duplicate_user_field(error: DuplicateKeyError):
+    """Field whose unique index rejected the insert, if it is one users can pick."""
+    key_pattern = (error.details or {}).get("keyPattern") or {}
+    for field in DUPLICATE_USER_MESSAGES:
+        if field in key_pattern or f"{field}_unique" in str(error):
+            return field
+    return None
+
+async def _send_verification_email_task(email: str, token: str, username: str):
+    try:
+        await send_verification_email(email, token, username)
+    except Exception:
+        logger.exception("Failed to send verification email to %s", email)
 
 @router.post("/signup", response_model=dict, status_code=status.HTTP_201_CREATED)
-async def signup(user_data: SignupRequest):
+async def signup(user_data: SignupRequest, background_tasks: BackgroundTasks):
     """Sign up a new user (doctor or patient)"""
     db = get_database()
     
@@ -101,22 +131,6 @@ async def signup(user_data: SignupRequest):
                 detail="Doctor role requires specialization and hospital_name"
             )
     
-    # Check if email already exists
-    existing_user = await db.users.find_one({"email": user_data.email})
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-    
-    # Check if username already exists
-    existing_username = await db.users.find_one({"username": user_data.username})
-    if existing_username:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already taken"
-        )
-    
     # Generate user_id and doctor_id if needed
     user_id = str(uuid.uuid4())
     doctor_id = None
@@ -124,7 +138,7 @@ async def signup(user_data: SignupRequest):
         doctor_id = str(uuid.uuid4())
     
     # Hash password
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     
     # Generate verification token
     verification_token = generate_verification_token()
@@ -152,11 +166,20 @@ async def signup(user_data: SignupRequest):
         user_doc["specialization"] = user_data.specialization
         user_doc["hospital_name"] = user_data.hospital_name
     
-    # Insert user
-    await db.users.insert_one(user_doc)
+    # Insert user; the unique indexes on email and username reject duplicates atomically
+    try:
+        await db.users.insert_one(user_doc)
+    except DuplicateKeyError as e:
+        field = _duplicate_user_field(e)
+        if field is None:
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=DUPLICATE_USER_MESSAGES[field]
+        )
     
-    # Send verification email
-    await send_verification_email(user_data.email, verification_token, user_data.username)
+    # Send verification email after the response goes out
+    background_tasks.add_task(_send_verification_email_task, user_data.email, verification_token, user_data.username)
     
     return {
         "message": "User created successfully. Please check your email to verify your account.",
@@ -178,7 +201,7 @@ async def login(login_data: LoginRequest):
         )
     
     # Verify password
-    if not verify_password(login_data.password, user["hashed_password"]):
+    if not await verify_password_async(login_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -246,6 +269,8 @@ async def verify_email(token: str = Query(..., description="Email verification t
             }
         }
     )
+    if user:
+        user_cache.invalidate(user["user_id"])
     
     return {"message": "Email verified successfully"}
 
@@ -1,28 +1,66 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, Query, BackgroundTasks, Header, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from datetime import datetime
+from typing import Optional
+from pymongo import ReturnDocument, UpdateOne
+from PIL import Image
+import time
 import uuid
 import os
-import aiofiles
-from app.models.image import ImageCreate, ImageResponse
+from app.models.image import (
+    ImageCreate,
+    ImageResponse,
+    TiledImageResponse,
+    BatchPredictRequest,
+    BatchPredictItem,
+    BatchPredictResponse,
+)
 from app.database import get_database
 from app.routers.auth import get_current_user
 from app.models.user import UserResponse
-from app.ml.inference import predict as run_model_predict
+from app.ml.inference import model_registry
+from app.ml.instrumentation import REQUESTS_COUNTER, run_inference, timed
+from app.ml.batching import MAX_BATCH_SIZE, get_batcher
+from app.ml.worker_pool import get_worker_pool, run_in_pool
+from app.ml.tiling import predict_tiled
+from app.ml.preprocess import TENSOR_CACHE_ENABLED, cache_tensor
+from app.ml.startup import inference_ready, require_inference_ready
+from app.ml.prediction_cache import CACHE_ENABLED, prediction_cache, sha256_file
+from app.utils.history import (
+    bump_history_version,
+    decode_history_cursor,
+    encode_history_cursor,
+    etag_matches,
+    get_history_version,
+    history_etag,
+)
+from app.utils.storage import UPLOAD_DIR, image_file_path, release_blob, remove_derived_files, store_blob_stream
+from app.utils.uploads import UPLOAD_REQUEST_BODY, MultipartFileStream, iter_upload_chunks, read_upload_header
+from app.ml.jobs import (
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    ACTIVE_STATES,
+    TERMINAL_STATES,
+    get_job_queue,
+    job_state,
+)
 import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 # Create uploads directory if it doesn't exist
-UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-@router.post("/upload", response_model=ImageResponse)
-async def upload_image(
-    file: UploadFile = File(...),
-    current_user: UserResponse = Depends(get_current_user)
-):
-    """Upload an image for analysis"""
-    db = get_database()
+async def _store_upload(request: Request):
+    """Validate and store the image in the request's `file` field. Returns (content_sha256, image_path)."""
+    # Read from the request stream: nothing is spooled, and non-images are refused before the rest arrives
+    file = await MultipartFileStream(request).open()
     
     # Validate file type (only PNG, JPG, JPEG)
     allowed_types = ['image/png', 'image/jpeg', 'image/jpg']
@@ -36,51 +74,257 @@ async def upload_image(
             detail="Only PNG, JPG, and JPEG images are allowed"
         )
     
-    # Generate unique filename
-    file_extension = os.path.splitext(file.filename)[1] if file.filename else '.jpg'
-    image_id = str(uuid.uuid4())
-    filename = f"{image_id}{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
+    # Check magic bytes before storing anything; the extension comes from the content
+    header, file_extension = await read_upload_header(file)
     
-    # Save file
+    # Stream to disk in bounded chunks, hashing as we go; identical uploads share a blob
     try:
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        content_sha256, image_path, _ = await store_blob_stream(
+            iter_upload_chunks(file, header), file_extension
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to save image: {str(e)}"
         )
-    
-    # Create image document
-    # Store relative path for serving
-    image_doc = {
-        "image_id": image_id,
-        "user_id": current_user.user_id,
+    return content_sha256, image_path
+
+def _new_image_doc(user_id: str, content_sha256: str, image_path: str) -> dict:
+    return {
+        "image_id": str(uuid.uuid4()),
+        "user_id": user_id,
         "upload_date": datetime.utcnow(),
-        "image_path": f"/uploads/{filename}",  # Relative path for serving
+        "image_path": image_path,  # Relative path for serving
+        "blob_digest": content_sha256,
+        "content_sha256": content_sha256,
         "result": None
     }
+
+async def _precompute_tensor(image_doc: dict):
+    """Background task: store the preprocessed tensor so the first prediction skips decoding."""
+    try:
+        await run_in_pool(get_worker_pool(), cache_tensor, _local_image_path(image_doc))
+    except Exception as e:
+        # Not fatal: the prediction path decodes the image and writes the tensor itself
+        logger.warning("Failed to precompute tensor for image %s: %s", image_doc["image_id"], e)
+
+@router.post("/upload", response_model=ImageResponse, openapi_extra=UPLOAD_REQUEST_BODY)
+async def upload_image(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Upload an image for analysis"""
+    db = get_database()
+    
+    content_sha256, image_path = await _store_upload(request)
+    image_doc = _new_image_doc(current_user.user_id, content_sha256, image_path)
     
     # Insert into database
-    await db.images.insert_one(image_doc)
+    try:
+        await db.images.insert_one(image_doc)
+    except Exception:
+        await release_blob(content_sha256)
+        raise
+    await bump_history_version([current_user.user_id])
+    
+    # Before inference is up there is no worker pool to run it in; the first prediction writes it instead
+    if TENSOR_CACHE_ENABLED and inference_ready():
+        background_tasks.add_task(_precompute_tensor, image_doc)
+    
+    return ImageResponse(**image_doc)
+
+@router.post(
+    "/analyze",
+    response_model=ImageResponse,
+    dependencies=[Depends(require_inference_ready)],
+    openapi_extra=UPLOAD_REQUEST_BODY,
+)
+async def upload_and_predict_image(
+    request: Request,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Upload an image and run prediction in one request, with a single insert"""
+    REQUESTS_COUNTER.labels(endpoint="analyze").inc()
+    db = get_database()
+    
+    content_sha256, image_path = await _store_upload(request)
+    image_doc = _new_image_doc(current_user.user_id, content_sha256, image_path)
+    
+    try:
+        result, version, _ = await predict_with_cache(image_doc)
+        image_doc["result"] = result
+        image_doc["model_version"] = version
+        with timed("db_write"):
+            await db.images.insert_one(image_doc)
+    except Exception:
+        await release_blob(content_sha256)
+        raise
+    await bump_history_version([current_user.user_id])
     
     return ImageResponse(**image_doc)
 
-@router.post("/predict/{image_id}", response_model=ImageResponse)
+def _result_changed(image: dict, result: str, version: str) -> bool:
+    """Whether storing this result changes what ImageResponse shows, i.e. whether history ETags must change."""
+    return (image.get("result"), image.get("model_version")) != (result, version)
+
+def _prediction_error_message(error: Exception) -> str:
+    """Fixed client-facing message; exception text from the filesystem or PIL includes server paths."""
+    if isinstance(error, FileNotFoundError):
+        return "Image file missing"
+    if isinstance(error, OSError):
+        return "Image could not be decoded"
+    return "Prediction failed"
+
+# Declared before /predict/{image_id} so "batch" is not taken as an image id
+@router.post("/predict/batch", response_model=BatchPredictResponse, dependencies=[Depends(require_inference_ready)])
+async def predict_images_batch(
+    request: BatchPredictRequest,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Run prediction on many uploaded images in one request"""
+    REQUESTS_COUNTER.labels(endpoint="batch").inc()
+    started = time.perf_counter()
+    db = get_database()
+    image_ids = list(dict.fromkeys(request.image_ids))
+    
+    with timed("db_read"):
+        images = await db.images.find(
+            {"image_id": {"$in": image_ids}, "user_id": current_user.user_id},
+            {"_id": 0, "image_id": 1, "image_path": 1, "content_sha256": 1, "result": 1, "model_version": 1}
+        ).to_list(length=len(image_ids))
+    by_id = {image["image_id"]: image for image in images}
+    
+    inference_started = time.perf_counter()
+    outcomes = await predict_many_with_cache([by_id[i] for i in image_ids if i in by_id])
+    inference_ms = (time.perf_counter() - inference_started) * 1000
+    
+    items = []
+    updates = []
+    changed = False
+    for image_id in image_ids:
+        if image_id not in by_id:
+            items.append(BatchPredictItem(image_id=image_id, error="Image not found"))
+            continue
+        outcome = outcomes[image_id]
+        if isinstance(outcome, Exception):
+            logger.warning("Batch prediction for image %s failed: %r", image_id, outcome)
+            items.append(BatchPredictItem(image_id=image_id, error=_prediction_error_message(outcome)))
+            continue
+        result, version, content_sha256, cached = outcome
+        items.append(BatchPredictItem(image_id=image_id, result=result, model_version=version, cached=cached))
+        changed = changed or _result_changed(by_id[image_id], result, version)
+        updates.append(UpdateOne(
+            {"image_id": image_id},
+            {"$set": {"result": result, "model_version": version, "content_sha256": content_sha256},
+             "$unset": {"heatmap": ""}}
+        ))
+    
+    if updates:
+        with timed("db_write"):
+            await db.images.bulk_write(updates, ordered=False)
+        if changed:
+            await bump_history_version([current_user.user_id])
+    
+    return BatchPredictResponse(
+        results=items,
+        total_ms=round((time.perf_counter() - started) * 1000, 2),
+        inference_ms=round(inference_ms, 2),
+    )
+
+@router.post(
+    "/predict/{image_id}/tiled",
+    response_model=TiledImageResponse,
+    dependencies=[Depends(require_inference_ready)]
+)
+async def predict_image_tiled(
+    image_id: str,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Run tiled whole-slide inference: per-tile predictions aggregated into a slide result and heatmap"""
+    REQUESTS_COUNTER.labels(endpoint="tiled").inc()
+    db = get_database()
+    
+    with timed("db_read"):
+        image = await db.images.find_one({
+            "image_id": image_id,
+            "user_id": current_user.user_id
+        })
+    
+    if not image:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found"
+        )
+    
+    # Tiles are already batched internally; run the whole slide in one executor call
+    try:
+        with timed("tiled_inference"):
+            prediction = await run_in_pool(get_worker_pool(), predict_tiled, _local_image_path(image))
+    except (FileNotFoundError, PermissionError):
+        # Our storage, not the upload, is at fault
+        raise
+    except OSError:
+        # UnidentifiedImageError or truncated data; PIL's message would expose the file path
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Image could not be decoded"
+        )
+    except (ValueError, Image.DecompressionBombError) as e:
+        # Too large to tile, or no tissue
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    
+    with timed("db_write"):
+        updated_image = await db.images.find_one_and_update(
+            {"image_id": image_id},
+            {"$set": {
+                "result": json.dumps(prediction.result),
+                "model_version": prediction.model_version,
+                "heatmap": prediction.heatmap,
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+    if not updated_image:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found"
+        )
+    if _result_changed(image, updated_image["result"], updated_image["model_version"]):
+        await bump_history_version([current_user.user_id])
+    return TiledImageResponse(**updated_image)
+
+@router.post(
+    "/predict/{image_id}",
+    response_model=ImageResponse,
+    dependencies=[Depends(require_inference_ready)],
+    responses={
+        202: {"description": "Prediction job queued, or the image's job already in progress (async=true)"},
+        409: {"description": "The image's previous job finished while this one was being queued; retry"},
+    }
+)
 async def predict_image(
     image_id: str,
+    async_job: bool = Query(False, alias="async", description="Queue the prediction and return 202 with a job id"),
     current_user: UserResponse = Depends(get_current_user)
 ):
     """Run prediction on an uploaded image"""
+    REQUESTS_COUNTER.labels(endpoint="async" if async_job else "predict").inc()
     db = get_database()
     
+    if async_job:
+        return await _enqueue_prediction_job(image_id, current_user.user_id)
+    
     # Find image
-    image = await db.images.find_one({
-        "image_id": image_id,
-        "user_id": current_user.user_id
-    })
+    with timed("db_read"):
+        image = await db.images.find_one({
+            "image_id": image_id,
+            "user_id": current_user.user_id
+        })
     
     if not image:
         raise HTTPException(
@@ -89,48 +333,367 @@ async def predict_image(
         )
     
     # Run model inference without blocking the event loop
-    result = await run_model_in_executor(image)
+    result, version, content_sha256 = await predict_with_cache(image)
     
-    # Update image with result
+    # Update image with result and return the updated document in one round trip
+    with timed("db_write"):
+        updated_image = await db.images.find_one_and_update(
+            {"image_id": image_id},
+            # A whole-image result replaces any tiled one, so its heatmap goes too
+            {"$set": {"result": result, "model_version": version, "content_sha256": content_sha256},
+             "$unset": {"heatmap": ""}},
+            return_document=ReturnDocument.AFTER
+        )
+    if not updated_image:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found"
+        )
+    # Re-predicting an unchanged image (the common, cached case) leaves history ETags valid
+    if _result_changed(image, result, version):
+        await bump_history_version([current_user.user_id])
+    return ImageResponse(**updated_image)
+
+async def _enqueue_prediction_job(image_id: str, user_id: str):
+    db = get_database()
+    queue = get_job_queue()
+    if queue is None or queue.full():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Prediction queue is full, please retry shortly",
+            headers={"Retry-After": "5"},
+        )
+    
+    job_id = str(uuid.uuid4())
+    # Never replace a job that is still queued or running: its result would be discarded
+    image = await db.images.find_one_and_update(
+        {"image_id": image_id, "user_id": user_id, "job.status": {"$nin": list(ACTIVE_STATES)}},
+        {"$set": {"job": job_state(job_id, JOB_QUEUED)}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not image:
+        image = await db.images.find_one(
+            {"image_id": image_id, "user_id": user_id},
+            {"_id": 0, "job": 1}
+        )
+        if not image:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Image not found"
+            )
+        job = image.get("job") or {}
+        if job.get("status") not in ACTIVE_STATES:
+            # The active job finished in between; the client can simply retry
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A prediction job for this image just finished, please retry"
+            )
+        # Answer with the job already in progress instead of starting another
+        return _job_accepted(job["job_id"], image_id, job["status"])
+    
+    try:
+        queue.enqueue(job_id, image)
+    except asyncio.QueueFull:
+        await db.images.update_one(
+            {"image_id": image_id},
+            {"$set": {"job": job_state(job_id, JOB_FAILED, "Prediction queue is full")}}
+        )
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Prediction queue is full, please retry shortly",
+            headers={"Retry-After": "5"},
+        )
+    
+    return _job_accepted(job_id, image_id, JOB_QUEUED)
+
+def _job_accepted(job_id: str, image_id: str, job_status: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "job_id": job_id,
+            "image_id": image_id,
+            "status": job_status,
+            "status_url": f"/image/jobs/{job_id}",
+            "events_url": f"/image/jobs/{job_id}/events",
+        },
+    )
+
+async def run_prediction_job(job_id: str, image: dict):
+    """Job queue handler: run one queued prediction and record its outcome on the image."""
+    db = get_database()
+    queue = get_job_queue()
     await db.images.update_one(
-        {"image_id": image_id},
-        {"$set": {"result": result}}
+        {"image_id": image["image_id"], "job.job_id": job_id},
+        {"$set": {"job": job_state(job_id, JOB_RUNNING)}}
     )
+    if queue:
+        queue.notify(job_id)
     
-    # Return updated image
-    updated_image = await db.images.find_one({"image_id": image_id})
-    return ImageResponse(**updated_image)
+    try:
+        result, version, content_sha256 = await predict_with_cache(image)
+    except Exception as e:
+        await db.images.update_one(
+            {"image_id": image["image_id"], "job.job_id": job_id},
+            {"$set": {"job": job_state(job_id, JOB_FAILED, _prediction_error_message(e))}}
+        )
+        raise
+    
+    await db.images.update_one(
+        {"image_id": image["image_id"], "job.job_id": job_id},
+        {"$set": {
+            "result": result,
+            "model_version": version,
+            "content_sha256": content_sha256,
+            "job": job_state(job_id, JOB_SUCCEEDED),
+        }, "$unset": {"heatmap": ""}}
+    )
+    if _result_changed(image, result, version):
+        await bump_history_version([image["user_id"]])
+
+def _job_payload(image: dict) -> dict:
+    job = image["job"]
+    return {
+        "job_id": job["job_id"],
+        "image_id": image["image_id"],
+        "status": job["status"],
+        "error": job.get("error"),
+        "result": image.get("result") if job["status"] == JOB_SUCCEEDED else None,
+        "model_version": image.get("model_version") if job["status"] == JOB_SUCCEEDED else None,
+    }
+
+async def _find_job(job_id: str, user_id: str):
+    db = get_database()
+    return await db.images.find_one(
+        {"job.job_id": job_id, "user_id": user_id},
+        {"_id": 0, "image_id": 1, "job": 1, "result": 1, "model_version": 1}
+    )
+
+@router.get("/jobs/{job_id}")
+async def get_prediction_job(
+    job_id: str,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Poll the status of a queued prediction"""
+    image = await _find_job(job_id, current_user.user_id)
+    if not image:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return _job_payload(image)
+
+# Listeners re-read the job at least this often, in case it runs in another worker
+JOB_EVENTS_POLL_SECONDS = 1.0
+JOB_EVENTS_KEEPALIVE_SECONDS = 15.0
+# Streams end after this long even if the job has not finished; clients fall back to polling
+JOB_EVENTS_TIMEOUT_SECONDS = float(os.getenv("PREDICTION_JOB_EVENTS_TIMEOUT_SECONDS", "600"))
+
+@router.get("/jobs/{job_id}/events")
+async def stream_prediction_job(
+    job_id: str,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Server-sent events stream of a prediction job's status, ending with its result (or a timeout event)"""
+    image = await _find_job(job_id, current_user.user_id)
+    if not image:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    async def events():
+        queue = get_job_queue()
+        wakeup = queue.listen(job_id) if queue else asyncio.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            last_status = None
+            last_sent = loop.time()
+            deadline = last_sent + JOB_EVENTS_TIMEOUT_SECONDS
+            current = image
+            while True:
+                payload = _job_payload(current)
+                if payload["status"] != last_status:
+                    last_status = payload["status"]
+                    last_sent = loop.time()
+                    yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+                    if last_status in TERMINAL_STATES:
+                        return
+                elif loop.time() - last_sent >= JOB_EVENTS_KEEPALIVE_SECONDS:
+                    last_sent = loop.time()
+                    yield ": keep-alive\n\n"
+                
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    yield f"event: timeout\ndata: {json.dumps(payload)}\n\n"
+                    return
+                try:
+                    await asyncio.wait_for(wakeup.wait(), min(JOB_EVENTS_POLL_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    pass
+                wakeup.clear()
+                current = await _find_job(job_id, current_user.user_id)
+                if current is None:
+                    # The image was deleted (or a later job replaced this one after it ended)
+                    payload.update(status=JOB_FAILED, error="Job no longer exists", result=None, model_version=None)
+                    yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+                    return
+        finally:
+            if queue:
+                queue.unlisten(job_id, wakeup)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 def _local_image_path(image_doc):
     # Stored path is like "/uploads/<file>"; convert to filesystem path
-    rel = image_doc["image_path"].lstrip("/")
-    return os.path.join(os.getcwd(), rel)
+    return image_file_path(image_doc["image_path"])
 
 async def run_model_in_executor(image):
-    """Execute model inference in a thread to keep FastAPI event loop responsive."""
-    loop = asyncio.get_running_loop()
+    """Execute model inference off the event loop, batched with concurrent requests when enabled."""
     image_path = _local_image_path(image)
-    return await loop.run_in_executor(None, lambda: run_model_predict(image_path))
+    batcher = get_batcher()
+    with timed("inference"):
+        if batcher is not None:
+            return await batcher.submit(image_path)
+        # Falls back to the default thread pool when no worker processes are configured
+        predictions = await run_inference([image_path], get_worker_pool())
+    return predictions[0]
 
-@router.get("/history", response_model=list[ImageResponse])
+async def predict_with_cache(image):
+    """
+    Return (result JSON string, model version, content SHA-256), reusing cached
+    results for identical image bytes. The caller persists all three.
+    """
+    content_sha256 = image.get("content_sha256")
+    if not CACHE_ENABLED:
+        prediction = await run_model_in_executor(image)
+        return json.dumps(prediction.result), prediction.model_version, content_sha256
+
+    loop = asyncio.get_running_loop()
+    if not content_sha256:
+        # Uploaded before hashes were recorded; hash once (the caller stores it)
+        content_sha256 = await loop.run_in_executor(None, sha256_file, _local_image_path(image))
+
+    version = await loop.run_in_executor(None, model_registry.serving_version)
+    with timed("cache_lookup"):
+        cached = await prediction_cache.get(content_sha256, version)
+    if cached is not None:
+        return json.dumps(cached), version, content_sha256
+
+    prediction = await run_model_in_executor(image)
+    await prediction_cache.put(content_sha256, prediction.model_version, prediction.result)
+    return json.dumps(prediction.result), prediction.model_version, content_sha256
+
+async def predict_many_with_cache(images):
+    """
+    Batched counterpart of predict_with_cache. Cache misses run through the
+    model in chunks of MAX_BATCH_SIZE (in parallel across worker processes).
+    Returns {image_id: (result JSON, model version, content SHA-256, cached) or Exception}.
+    """
+    loop = asyncio.get_running_loop()
+    outcomes = {}
+    
+    async def ensure_hash(image):
+        if image.get("content_sha256"):
+            return True
+        try:
+            image["content_sha256"] = await loop.run_in_executor(None, sha256_file, _local_image_path(image))
+        except Exception as e:
+            # e.g. a legacy upload whose file is gone; fails this image only
+            outcomes[image["image_id"]] = e
+            return False
+        return True
+    
+    pending = []
+    if CACHE_ENABLED:
+        hashed = await asyncio.gather(*[ensure_hash(image) for image in images])
+        images = [image for image, ok in zip(images, hashed) if ok]
+        version = await loop.run_in_executor(None, model_registry.serving_version)
+        with timed("cache_lookup"):
+            cached = await prediction_cache.get_many([image["content_sha256"] for image in images], version)
+        for image in images:
+            if image["content_sha256"] in cached:
+                outcomes[image["image_id"]] = (
+                    json.dumps(cached[image["content_sha256"]]), version, image["content_sha256"], True
+                )
+            else:
+                pending.append(image)
+    else:
+        pending = list(images)
+    
+    async def run_chunk(chunk):
+        paths = [_local_image_path(image) for image in chunk]
+        try:
+            with timed("inference"):
+                predictions = await run_inference(paths, get_worker_pool())
+        except Exception as e:
+            if len(chunk) > 1:
+                # Isolate the failing image(s) instead of failing the whole chunk
+                await asyncio.gather(*[run_chunk([image]) for image in chunk])
+            else:
+                outcomes[chunk[0]["image_id"]] = e
+            return
+        for image, prediction in zip(chunk, predictions):
+            if CACHE_ENABLED:
+                await prediction_cache.put(image["content_sha256"], prediction.model_version, prediction.result)
+            outcomes[image["image_id"]] = (
+                json.dumps(prediction.result), prediction.model_version, image.get("content_sha256"), False
+            )
+    
+    chunks = [pending[i:i + MAX_BATCH_SIZE] for i in range(0, len(pending), MAX_BATCH_SIZE)]
+    await asyncio.gather(*[run_chunk(chunk) for chunk in chunks])
+    return outcomes
+
+# Only what ImageResponse needs; heatmaps (see GET /image/{image_id}) and job state are left out
+HISTORY_PROJECTION = {"_id": 0, **{field: 1 for field in ImageResponse.__fields__}}
+HISTORY_SORT = [("upload_date", -1), ("image_id", -1)]
+
+@router.get(
+    "/history",
+    response_model=list[ImageResponse],
+    responses={304: {"description": "History page unchanged since the ETag in If-None-Match"}}
+)
 async def get_image_history(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500, description="Images per page"),
+    after: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    if_none_match: Optional[str] = Header(None),
     current_user: UserResponse = Depends(get_current_user)
 ):
-    """Get user's image upload history"""
+    """
+    Get user's image upload history, newest first. When more images exist,
+    the X-Next-Cursor header holds the `after` value for the next page.
+    """
     db = get_database()
     
-    images = await db.images.find(
-        {"user_id": current_user.user_id}
-    ).sort("upload_date", -1).to_list(length=100)
+    query = {"user_id": current_user.user_id}
+    if after:
+        query.update(decode_history_cursor(after))
+    
+    # Read the version before the images: a write in between changes the next ETag, never hides itself
+    version = await get_history_version(current_user.user_id)
+    headers = {"ETag": history_etag(current_user.user_id, version, limit, after), "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
     
-    return [ImageResponse(**img) for img in images]
+    # One extra document tells whether there is a next page
+    with timed("db_read"):
+        images = await db.images.find(query, HISTORY_PROJECTION).sort(HISTORY_SORT).limit(limit + 1).to_list(length=limit + 1)
+    if len(images) > limit:
+        headers["X-Next-Cursor"] = encode_history_cursor(images[limit - 1])
+    
+    response.headers.update(headers)
+    return [ImageResponse(**img) for img in images[:limit]]
 
-@router.get("/{image_id}", response_model=ImageResponse)
+@router.get("/{image_id}", response_model=TiledImageResponse)
 async def get_image(
     image_id: str,
     current_user: UserResponse = Depends(get_current_user)
 ):
-    """Get a specific image by ID"""
+    """Get a specific image by ID, with the tile heatmap if its result came from tiled inference"""
     db = get_database()
     
     image = await db.images.find_one({
@@ -144,5 +707,34 @@ async def get_image(
             detail="Image not found"
         )
     
-    return ImageResponse(**image)
+    return TiledImageResponse(**image)
 
+@router.delete("/{image_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_image(
+    image_id: str,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Delete an image; its file is removed once no other image shares the content"""
+    db = get_database()
+    
+    image = await db.images.find_one_and_delete({
+        "image_id": image_id,
+        "user_id": current_user.user_id
+    })
+    
+    if not image:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found"
+        )
+    await bump_history_version([current_user.user_id])
+    
+    if image.get("blob_digest"):
+        await release_blob(image["blob_digest"])
+    else:
+        # Legacy flat upload, owned by this document alone
+        try:
+            os.remove(_local_image_path(image))
+        except FileNotFoundError:
+            pass
+        remove_derived_files(_local_image_path(image))
@@ -1,6 +1,8 @@
 from .auth import (
     verify_password,
     get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
     verify_token,
     generate_verification_token
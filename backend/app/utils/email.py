@@ -1,3 +1,4 @@
+import asyncio
 import smtplib
 import os
 from email.mime.text import MIMEText
@@ -12,6 +13,13 @@ SMTP_USER = os.getenv("SMTP_USER", "")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
 
+def _deliver(msg):
+    server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+    server.starttls()
+    server.login(SMTP_USER, SMTP_PASSWORD)
+    server.send_message(msg)
+    server.quit()
+
 async def send_verification_email(email: str, token: str, username: str):
     """Send email verification link"""
     if not SMTP_USER or not SMTP_PASSWORD:
@@ -42,11 +50,8 @@ async def send_verification_email(email: str, token: str, username: str):
     msg.attach(MIMEText(body, 'html'))
     
     try:
-        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
-        server.starttls()
-        server.login(SMTP_USER, SMTP_PASSWORD)
-        server.send_message(msg)
-        server.quit()
+        # smtplib blocks; keep the SMTP exchange off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, _deliver, msg)
         print(f"Verification email sent to {email}")
     except Exception as e:
         print(f"Failed to send email to {email}: {e}")
@@ -0,0 +1,86 @@
+"""
+Keyset cursors and cheap ETags for ``/image/history``.
+
+Pages are ordered by ``(upload_date, image_id)`` descending; the cursor is
+the key of the last image on a page, base64url-encoded.
+
+Every write that changes what ``ImageResponse`` shows for a user's images
+(upload, prediction, re-scoring, delete) increments
+``users.history_version`` after the image write. The history ETag is
+derived from that counter and the page requested, so a conditional request
+that ends in ``304`` costs one ``users`` lookup and reads no images.
+
+The bump is one extra indexed ``users`` update per write; predictions skip
+it when the stored result did not change. It is best-effort: a failed bump
+is logged and the write still succeeds, at the cost of clients possibly
+getting a stale ``304`` until the user's next write.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Iterable, Optional
+
+from fastapi import HTTPException, status
+
+from app.database import get_database
+
+logger = logging.getLogger(__name__)
+
+
+def encode_history_cursor(image: dict) -> str:
+    key = json.dumps([image["upload_date"].isoformat(), image["image_id"]])
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+
+def decode_history_cursor(token: str) -> dict:
+    """Query for the images strictly after the cursor, newest first. Raises 400 for a malformed cursor."""
+    try:
+        upload_date, image_id = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        upload_date = datetime.fromisoformat(upload_date)
+        if not isinstance(image_id, str):
+            raise TypeError("image_id must be a string")
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid history cursor"
+        )
+    return {"$or": [
+        {"upload_date": {"$lt": upload_date}},
+        {"upload_date": upload_date, "image_id": {"$lt": image_id}},
+    ]}
+
+
+async def bump_history_version(user_ids: Iterable[str]) -> None:
+    """Invalidate the history ETags of ``user_ids``. Call after the image write, never before."""
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return
+    db = get_database()
+    try:
+        await db.users.update_many({"user_id": {"$in": user_ids}}, {"$inc": {"history_version": 1}})
+    except Exception:
+        # The image write already succeeded; failing the request now would only hide that
+        logger.exception("Failed to bump history version for %d user(s)", len(user_ids))
+
+
+async def get_history_version(user_id: str) -> int:
+    db = get_database()
+    user = await db.users.find_one({"user_id": user_id}, {"_id": 0, "history_version": 1})
+    return (user or {}).get("history_version", 0)
+
+
+def history_etag(user_id: str, version: int, limit: int, after: Optional[str]) -> str:
+    digest = hashlib.sha256(f"{user_id}:{version}:{limit}:{after or ''}".encode())
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
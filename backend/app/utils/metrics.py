@@ -0,0 +1,235 @@
+"""
+Minimal in-process metrics primitives.
+
+Metrics register themselves in a module-level registry so they can be
+rendered together in the Prometheus text exposition format. Histograms,
+counters and gauges may declare label names; call ``.labels(...)`` to get
+the child series for one label combination.
+"""
+
+import abc
+import bisect
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_REGISTRY: List["_Metric"] = []
+_registry_lock = threading.Lock()
+
+# Default buckets in seconds, tuned for sub-second request stages
+DEFAULT_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class _Metric(abc.ABC):
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+
+    def labels(self, **labels: object):
+        """Child series for one combination of label values."""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+        return child
+
+    @abc.abstractmethod
+    def _new_child(self) -> "_Metric":
+        """Unlabelled metric of the same kind, holding one label combination's series."""
+
+    @abc.abstractmethod
+    def _samples(self, labels: Sequence[Tuple[str, str]]) -> List[str]:
+        """Exposition lines of this series, with ``labels`` attached."""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        if not self.labelnames:
+            lines.extend(self._samples(()))
+            return lines
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            lines.extend(child._samples(tuple(zip(self.labelnames, key))))
+        return lines
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed upper bounds (Prometheus semantics)."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+        labelnames: Sequence[str] = (),
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.help_text, self.buckets)
+
+    def observe(self, value: float) -> None:
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        """Return cumulative bucket counts, sum and count."""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = []
+        running = 0
+        for bound, n in zip(list(self.buckets) + [float("inf")], counts):
+            running += n
+            cumulative.append((bound, running))
+        return {"buckets": cumulative, "sum": total, "count": count}
+
+    def _samples(self, labels: Sequence[Tuple[str, str]]) -> List[str]:
+        snap = self.snapshot()
+        lines = []
+        for bound, cumulative in snap["buckets"]:
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            lines.append(f"{self.name}_bucket{_format_labels(tuple(labels) + (('le', le),))} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {snap['sum']}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {snap['count']}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._value = 0.0
+
+    def _new_child(self) -> "Counter":
+        return Counter(self.name, self.help_text)
+
+    def inc(self, amount: float = 1.0) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def _samples(self, labels: Sequence[Tuple[str, str]]) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {self._value}"]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is read from a callback at render time."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def _new_child(self) -> "Gauge":
+        return Gauge(self.name, self.help_text)
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Report ``function()`` instead of the stored value."""
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return self._value
+
+    def _samples(self, labels: Sequence[Tuple[str, str]]) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {self.value}"]
+
+
+def _register(metric: _Metric) -> _Metric:
+    """Register ``metric``, returning the existing one on re-registration."""
+    with _registry_lock:
+        for existing in _REGISTRY:
+            if existing.name == metric.name:
+                return existing
+        _REGISTRY.append(metric)
+        return metric
+
+
+def histogram(
+    name: str,
+    help_text: str,
+    buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    labelnames: Sequence[str] = (),
+) -> Histogram:
+    """Create and register a histogram, returning the existing one on re-registration."""
+    return _register(Histogram(name, help_text, buckets, labelnames))
+
+
+def counter(name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Create and register a counter, returning the existing one on re-registration."""
+    return _register(Counter(name, help_text, labelnames))
+
+
+def gauge(name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+    """Create and register a gauge, returning the existing one on re-registration."""
+    return _register(Gauge(name, help_text, labelnames))
+
+
+def render_metrics() -> str:
+    """Render every registered metric in Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_REGISTRY)
+    lines: List[str] = []
+    for metric in metrics:
+        try:
+            lines.extend(metric.render())
+        except Exception:
+            # A failing gauge callback must not take the whole endpoint down
+            logger.exception("Failed to render metric %s", metric.name)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,261 @@
+"""
+Content-addressed, deduplicated storage for uploaded images.
+
+Uploads are stored once per distinct content under
+``uploads/blobs/<aa>/<bb>/<sha256><ext>``; the two levels of sharding keep
+every directory small even with millions of images. The ``blobs``
+collection tracks how many image documents reference each blob, and a blob
+file is removed only when its last reference is released, together with any
+files derived from it (``<blob>.<suffix>``, e.g. preprocessed tensors).
+
+Migrate an existing flat ``uploads/`` directory (from the backend directory):
+
+    python -m app.utils.storage migrate
+"""
+
+import argparse
+import asyncio
+import glob
+import hashlib
+import os
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+
+import aiofiles
+from pymongo import ReturnDocument
+
+from app.database import get_database
+from app.utils.history import bump_history_version
+
+UPLOAD_DIR = "uploads"
+BLOB_SUBDIR = "blobs"
+# In-progress uploads are staged here, on the same filesystem as the blobs
+TMP_SUBDIR = "tmp"
+
+
+def blob_relpath(digest: str, extension: str) -> str:
+    """Path of a blob relative to UPLOAD_DIR, sharded by the first two digest bytes."""
+    return "/".join([BLOB_SUBDIR, digest[:2], digest[2:4], f"{digest}{extension.lower()}"])
+
+
+def local_path(relpath: str) -> str:
+    return os.path.join(UPLOAD_DIR, *relpath.split("/"))
+
+
+def image_file_path(image_path: str) -> str:
+    """Filesystem path of a stored ``image_path`` (``/uploads/...``), relative to the working directory."""
+    return os.path.join(os.getcwd(), image_path.lstrip("/"))
+
+
+def remove_derived_files(path: str) -> None:
+    """Remove files derived from an upload and stored next to it (``<path>.<suffix>``)."""
+    for derived in glob.glob(f"{glob.escape(path)}.*"):
+        if derived.endswith(".deleting"):
+            continue
+        try:
+            os.remove(derived)
+        except FileNotFoundError:
+            pass
+
+
+def public_path(relpath: str) -> str:
+    """Path stored on image documents and served by the /uploads static mount."""
+    return f"/{UPLOAD_DIR}/{relpath}"
+
+
+async def acquire_blob(digest: str, extension: str, size: int) -> Dict:
+    """
+    Add a reference to the blob ``digest``, creating its document if needed.
+    Returns the blob document (with the canonical ``path``) after the increment.
+    """
+    db = get_database()
+    return await db.blobs.find_one_and_update(
+        {"_id": digest},
+        {
+            "$inc": {"refcount": 1},
+            "$setOnInsert": {
+                "path": blob_relpath(digest, extension),
+                "size": size,
+                "created_at": datetime.utcnow(),
+            },
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def store_blob_stream(chunks: AsyncIterator[bytes], extension: str) -> Tuple[str, str, int]:
+    """
+    Stream ``chunks`` to a staging file while hashing them, then move the
+    file into the blob store (or drop it if that content already exists)
+    and take a reference. Returns ``(digest, public_path, size)``.
+    """
+    tmp_dir = os.path.join(UPLOAD_DIR, TMP_SUBDIR)
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, f"{uuid.uuid4().hex}.tmp")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as f:
+            async for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                await f.write(chunk)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    hexdigest = digest.hexdigest()
+    try:
+        blob = await acquire_blob(hexdigest, extension, size)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    path = local_path(blob["path"])
+    # Reference first, file second: a concurrent release either sees our
+    # reference or has already moved the old file out of the way.
+    try:
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+    except BaseException:
+        await release_blob(hexdigest)
+        raise
+    return hexdigest, public_path(blob["path"]), size
+
+
+async def release_blob(digest: Optional[str]) -> bool:
+    """
+    Drop one reference to ``digest``. Removes the file once nothing references it.
+    Returns True if the blob was deleted.
+    """
+    if not digest:
+        return False
+    db = get_database()
+    blob = await db.blobs.find_one_and_update(
+        {"_id": digest, "refcount": {"$gt": 0}},
+        {"$inc": {"refcount": -1}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if blob is None or blob["refcount"] > 0:
+        return False
+
+    path = local_path(blob["path"])
+    tombstone = f"{path}.deleting"
+    try:
+        os.replace(path, tombstone)
+    except FileNotFoundError:
+        tombstone = None
+
+    result = await db.blobs.delete_one({"_id": digest, "refcount": {"$lte": 0}})
+    if result.deleted_count == 0:
+        # Re-acquired while we were deleting; put the file back unless the new owner rewrote it
+        if tombstone and not os.path.exists(path):
+            os.replace(tombstone, path)
+        elif tombstone:
+            os.remove(tombstone)
+        return False
+
+    if tombstone:
+        os.remove(tombstone)
+    remove_derived_files(path)
+    return True
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_derived_name(name: str, names: Set[str]) -> bool:
+    """Whether ``name`` is ``<other>.<suffix>`` for another file ``<other>`` in ``names`` (see remove_derived_files)."""
+    stem = name
+    while "." in stem:
+        stem = stem.rsplit(".", 1)[0]
+        if stem in names:
+            return True
+    return False
+
+
+async def migrate_flat_uploads() -> Dict[str, int]:
+    """
+    Move every file directly under UPLOAD_DIR into the blob store and repoint
+    the image documents that reference it. Files no document references are
+    left in place and reported as orphans.
+    """
+    db = get_database()
+    stats = {"files": 0, "migrated": 0, "deduplicated": 0, "orphans": 0, "bytes_freed": 0}
+    # Listed up front: the loop moves uploads and deletes their derived files as it goes
+    entries = [entry for entry in os.scandir(UPLOAD_DIR) if entry.is_file()]
+    names = {entry.name for entry in entries}
+    for entry in entries:
+        if entry.name.endswith(".tmp") or _is_derived_name(entry.name, names):
+            continue
+        stats["files"] += 1
+        old_public_path = f"/{UPLOAD_DIR}/{entry.name}"
+        references = await db.images.count_documents({"image_path": old_public_path})
+        if references == 0:
+            stats["orphans"] += 1
+            continue
+
+        digest = await asyncio.get_running_loop().run_in_executor(None, _sha256_file, entry.path)
+        extension = os.path.splitext(entry.name)[1]
+        blob = await acquire_blob(digest, extension, entry.stat().st_size)
+        target = local_path(blob["path"])
+        if os.path.exists(target):
+            stats["deduplicated"] += 1
+            stats["bytes_freed"] += entry.stat().st_size
+            os.remove(entry.path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(entry.path, target)
+        # Derived files (e.g. preprocessed tensors) are regenerated next to the blob on demand
+        remove_derived_files(entry.path)
+
+        owners = await db.images.find({"image_path": old_public_path}, {"_id": 0, "user_id": 1}).to_list(length=None)
+        result = await db.images.update_many(
+            {"image_path": old_public_path},
+            {
+                "$set": {
+                    "image_path": public_path(blob["path"]),
+                    "blob_digest": digest,
+                    "content_sha256": digest,
+                }
+            },
+        )
+        # acquire_blob took one reference; account for the rest
+        if result.modified_count != 1:
+            await db.blobs.update_one({"_id": digest}, {"$inc": {"refcount": result.modified_count - 1}})
+        await bump_history_version(owner["user_id"] for owner in owners)
+        stats["migrated"] += 1
+    return stats
+
+
+async def _run_migration() -> None:
+    from app.database import close_mongo_connection, connect_to_mongo
+
+    await connect_to_mongo()
+    try:
+        stats = await migrate_flat_uploads()
+    finally:
+        await close_mongo_connection()
+    print(f"Migration complete: {stats}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Content-addressed upload storage tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="Convert the flat uploads/ directory into the blob store")
+    parser.parse_args(argv)
+    asyncio.run(_run_migration())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Bounded, validated streaming of image uploads.
+
+Upload endpoints take the raw ``Request`` instead of an ``UploadFile``:
+Starlette would receive and spool the whole multipart body to a temporary
+file before the handler runs, and the handler would then copy it a second
+time into the blob store. ``MultipartFileStream`` instead parses the body
+as it arrives and hands out the ``file`` field in fixed-size chunks, so:
+
+- the first chunk is checked against PNG/JPEG magic bytes before the rest
+  of the body is received, and non-images are rejected right there;
+- the file is written to disk once, straight into the blob store's
+  staging file, while it is hashed and its size is checked against
+  ``MAX_UPLOAD_BYTES``.
+
+``UploadSizeLimitMiddleware`` rejects oversized bodies with ``413`` from the
+``Content-Length`` header, or, for chunked bodies, as soon as the limit is
+crossed while the body is still being received.
+"""
+
+import os
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, Request, status
+from multipart import MultipartParser
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import parse_options_header
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Allowance for multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+_MAGIC_EXTENSIONS = (
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+)
+
+
+def sniff_image_extension(header: bytes) -> Optional[str]:
+    """Canonical extension for a PNG/JPEG header, or None for anything else."""
+    for magic, extension in _MAGIC_EXTENSIONS:
+        if header.startswith(magic):
+            return extension
+    return None
+
+
+# OpenAPI description of the body MultipartFileStream reads, for routes that take the raw Request
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"],
+                },
+            },
+        },
+    },
+}
+
+
+class MultipartFileStream:
+    """
+    One file field of a ``multipart/form-data`` request, read straight from
+    the request stream. ``read`` has ``UploadFile.read`` semantics; the rest
+    of the body is never received once the field has been read.
+    """
+
+    def __init__(self, request: Request, field_name: str = "file"):
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self._stream = request.stream()
+        self._buffer = bytearray()
+        self._found = False  # headers of the field have been parsed
+        self._in_field = False
+        self._done = False  # the field's data has ended
+        self._headers = {}
+        self._header_name = b""
+        self._header_value = b""
+
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Expected a multipart/form-data body"
+            )
+        self._parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+
+    async def open(self) -> "MultipartFileStream":
+        """Receive the body up to the field's headers; 422 if the field is missing."""
+        while not self._found:
+            await self._receive()
+        return self
+
+    async def read(self, size: int) -> bytes:
+        """Up to ``size`` bytes of the field; fewer only at its end, ``b""`` after it."""
+        while len(self._buffer) < size and not self._done:
+            await self._receive()
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+    async def _receive(self) -> None:
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            chunk = b""
+        if not chunk:
+            # Also where a body cut short by UploadSizeLimitMiddleware ends up; it answers 413 instead
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Missing or incomplete '{self.field_name}' file field"
+            )
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Malformed multipart body"
+            )
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if self._found or options.get(b"name", b"").decode("latin-1") != self.field_name:
+            return
+        self._found = self._in_field = True
+        self.filename = options.get(b"filename", b"").decode("utf-8", "replace") or None
+        self.content_type = self._headers.get(b"content-type", b"").decode("latin-1") or None
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_field:
+            self._buffer += data[start:end]
+
+    def _on_part_end(self) -> None:
+        if self._in_field:
+            self._in_field = False
+            self._done = True
+
+
+async def read_upload_header(file: MultipartFileStream) -> tuple:
+    """Read the first chunk and validate it. Returns ``(chunk, extension)``."""
+    header = await file.read(UPLOAD_CHUNK_SIZE)
+    extension = sniff_image_extension(header)
+    if extension is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only PNG, JPG, and JPEG images are allowed"
+        )
+    return header, extension
+
+
+async def iter_upload_chunks(
+    file: MultipartFileStream, header: bytes, max_bytes: int = MAX_UPLOAD_BYTES
+) -> AsyncIterator[bytes]:
+    """Yield ``header`` then the rest of ``file`` in bounded chunks, enforcing ``max_bytes``."""
+    total = 0
+    chunk = header
+    while chunk:
+        total += len(chunk)
+        if total > max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Image exceeds the {max_bytes // (1024 * 1024)} MB upload limit"
+            )
+        yield chunk
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+
+
+class UploadSizeLimitMiddleware:
+    """Pure ASGI middleware that stops oversized request bodies early."""
+
+    def __init__(self, app, max_body_bytes: int = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    async def _reject(self, send) -> None:
+        body = b'{"detail":"Request body too large"}'
+        await send({
+            "type": "http.response.start",
+            "status": status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT"):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > self.max_body_bytes:
+                    await self._reject(send)
+                    return
+                break
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    exceeded = True
+                    # End the body here; whatever the app answers is replaced by a 413
+                    return {"type": "http.request", "body": b"", "more_body": False}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if exceeded:
+                if message["type"] == "http.response.start" and not response_started:
+                    response_started = True
+                    await self._reject(send)
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
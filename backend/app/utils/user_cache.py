@@ -0,0 +1,90 @@
+"""
+Short-lived cache of authenticated users for ``get_current_user``.
+
+Every authenticated request decodes its JWT and then loads the user from
+``users``. The decoded identity is stable for the life of the token, so
+the resulting ``UserResponse`` is kept for ``AUTH_USER_CACHE_TTL_SECONDS``
+under ``(user_id, token)``; the JWT signature and expiry are still checked
+on every request. Entries are evicted LRU beyond
+``AUTH_USER_CACHE_MAX_ENTRIES`` and dropped explicitly with
+``invalidate(user_id)`` whenever this process changes a user document.
+Other uvicorn workers see such a change once their entry expires, so the
+TTL bounds how stale a profile can be.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from app.models.user import UserResponse
+from app.utils.metrics import counter, gauge
+
+USER_CACHE_ENABLED = os.getenv("AUTH_USER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", "10000"))
+
+USER_CACHE_LOOKUPS_COUNTER = counter(
+    "auth_user_cache_lookups_total",
+    "Authenticated user lookups by outcome (hit, miss)",
+    labelnames=("result",),
+)
+USER_CACHE_ENTRIES_GAUGE = gauge("auth_user_cache_entries", "Users currently cached for authentication")
+
+class UserCache:
+    def __init__(self, ttl_seconds: float = USER_CACHE_TTL_SECONDS, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, UserResponse]]" = OrderedDict()
+        self._keys_by_user: Dict[str, Set[Tuple[str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: str, token: str) -> Optional[UserResponse]:
+        key = (user_id, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                USER_CACHE_LOOKUPS_COUNTER.labels(result="miss").inc()
+                return None
+            self._entries.move_to_end(key)
+        USER_CACHE_LOOKUPS_COUNTER.labels(result="hit").inc()
+        return entry[1]
+
+    def put(self, user_id: str, token: str, user: UserResponse) -> None:
+        key = (user_id, token)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(key)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, user_id: str) -> None:
+        """Forget every cached token of ``user_id``; call after changing its document."""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+
+user_cache = UserCache()
+USER_CACHE_ENTRIES_GAUGE.set_function(lambda: len(user_cache))
@@ -0,0 +1,5 @@
+"""
+Offline benchmarks for the inference path. Run from the backend directory, e.g.
+
+    python -m benchmarks.decode --images-dir data/holdout
+"""
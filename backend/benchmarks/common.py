@@ -0,0 +1,35 @@
+"""Helpers shared by the benchmark commands."""
+
+from pathlib import Path
+from typing import List, Sequence
+
+import torch
+from PIL import Image
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile, ``q`` in [0, 100]."""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * q / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def synthetic_images(folder: Path, count: int, size: int, seed: int = 0) -> List[Path]:
+    """
+    Write ``count`` deterministic JPEGs of ``size`` x ``size``: smooth noise
+    (upscaled from 32x32) so they compress and decode like photographs
+    rather than like pure noise.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    paths = []
+    for i in range(count):
+        pixels = torch.randint(0, 256, (32, 32, 3), dtype=torch.uint8, generator=generator)
+        img = Image.fromarray(pixels.numpy(), "RGB").resize((size, size), Image.BILINEAR)
+        path = folder / f"synthetic_{i:04d}.jpg"
+        img.save(path, quality=90)
+        paths.append(path)
+    return paths
@@ -0,0 +1,95 @@
+"""
+Decode/preprocess benchmark: full-resolution decode (the original
+``Image.open(...).convert("RGB")`` + ``_transform`` path) against the
+JPEG draft decode used by ``_load_tensor``.
+
+Reports per-image preprocessing time for both paths, pixel drift of the
+resulting tensors and, with ``--with-model``, how often the served model's
+top-1 label changes and by how much its confidence moves.
+
+    python -m benchmarks.decode --images-dir data/holdout --with-model
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+import torch
+from PIL import Image
+
+from app.ml.inference import DEVICE, _load_model, _load_tensor, _postprocess_output, _transform
+from app.ml.quantization import list_images
+
+
+def _reference_tensor(path: str) -> torch.Tensor:
+    return _transform(Image.open(path).convert("RGB"))
+
+
+def _draft_tensor(path: str) -> torch.Tensor:
+    return _load_tensor(path, draft=True)
+
+
+def _time_path(load: Callable[[str], torch.Tensor], paths: Sequence[str], repeat: int):
+    tensors: List[torch.Tensor] = []
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tensors = [load(path) for path in paths]
+        best = min(best, time.perf_counter() - start)
+    return tensors, best
+
+
+def _model_drift(reference: List[torch.Tensor], candidate: List[torch.Tensor], batch_size: int) -> Dict[str, float]:
+    model = _load_model()
+    ref_results, cand_results = [], []
+    with torch.no_grad():
+        for start in range(0, len(reference), batch_size):
+            ref_results += _postprocess_output(model(torch.stack(reference[start:start + batch_size]).to(DEVICE)))
+            cand_results += _postprocess_output(model(torch.stack(candidate[start:start + batch_size]).to(DEVICE)))
+    agree = sum(r["label"] == c["label"] for r, c in zip(ref_results, cand_results))
+    drift = torch.tensor([abs(r["confidence"] - c["confidence"]) for r, c in zip(ref_results, cand_results)])
+    return {
+        "top1_agreement": round(agree / len(ref_results), 4),
+        "mean_confidence_drift": round(drift.mean().item(), 4),
+        "max_confidence_drift": round(drift.max().item(), 4),
+    }
+
+
+def run(paths: Sequence[Path], repeat: int = 3, with_model: bool = False, batch_size: int = 16) -> Dict:
+    paths = [str(p) for p in paths]
+    jpegs = sum(Image.open(p).format == "JPEG" for p in paths)
+    reference, ref_time = _time_path(_reference_tensor, paths, repeat)
+    candidate, cand_time = _time_path(_draft_tensor, paths, repeat)
+
+    n = len(paths)
+    pixel_drift = torch.stack([(r - c).abs().mean() for r, c in zip(reference, candidate)])
+    report = {
+        "images": n,
+        "jpeg_images": jpegs,
+        "full_decode_ms_per_image": round(ref_time * 1000 / n, 3),
+        "draft_decode_ms_per_image": round(cand_time * 1000 / n, 3),
+        "speedup": round(ref_time / cand_time, 2) if cand_time else 0.0,
+        "mean_abs_pixel_drift": round(pixel_drift.mean().item(), 5),
+        "max_abs_pixel_drift": round(max((r - c).abs().max().item() for r, c in zip(reference, candidate)), 5),
+    }
+    if with_model:
+        report.update(_model_drift(reference, candidate, batch_size))
+    return report
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark JPEG draft decoding against full decoding")
+    parser.add_argument("--images-dir", type=Path, required=True)
+    parser.add_argument("--max-images", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per path; the best is reported")
+    parser.add_argument("--with-model", action="store_true", help="Also measure prediction drift")
+    args = parser.parse_args(argv)
+
+    paths = list_images(args.images_dir, args.max_images)
+    print(json.dumps(run(paths, args.repeat, args.with_model), indent=2))
+
+
+if __name__ == "__main__":
+    main()
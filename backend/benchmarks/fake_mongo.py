@@ -0,0 +1,446 @@
+"""
+In-memory stand-in for the subset of Motor the app uses, for load tests
+and local runs without a MongoDB server.
+
+Covers ``find``/``find_one`` (with projection, ``sort``, ``skip``,
+``limit``, ``to_list`` and ``async for``), ``insert_one``, ``update_one``,
+``update_many``, ``find_one_and_update``, ``find_one_and_delete``,
+``delete_one``, ``delete_many``, ``count_documents``, ``bulk_write``
+(``UpdateOne``/``InsertOne``/``DeleteOne``), ``create_index`` (unique
+indexes are enforced) and ``drop_index``. Queries support equality on dotted paths and
+``$ne $in $nin $lt $lte $gt $gte $exists $or $and``; updates support
+``$set $unset $inc $setOnInsert``.
+
+Every call optionally sleeps ``latency_ms`` to stand in for the network
+round trip, so a load test still interleaves requests the way a real
+driver would. Documents are deep-copied in and out, like BSON.
+"""
+
+import asyncio
+import copy
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+from pymongo import DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+_MISSING = object()
+
+
+def _get_path(doc: Dict, path: str) -> Any:
+    value: Any = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _set_path(doc: Dict, path: str, value: Any) -> None:
+    *parents, leaf = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[leaf] = value
+
+
+def _unset_path(doc: Dict, path: str) -> None:
+    *parents, leaf = path.split(".")
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(leaf, None)
+
+
+def _compare(value: Any, op: str, operand: Any) -> bool:
+    if op == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if value is _MISSING:
+        value = None
+    if op == "$ne":
+        return value != operand
+    if op == "$in":
+        return value in operand
+    if op == "$nin":
+        return value not in operand
+    if value is None or operand is None:
+        return False
+    try:
+        if op == "$lt":
+            return value < operand
+        if op == "$lte":
+            return value <= operand
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+    except TypeError:
+        return False
+    raise NotImplementedError(f"Query operator {op} is not supported")
+
+
+def matches(doc: Dict, query: Dict) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            value = _get_path(doc, key)
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        else:
+            value = _get_path(doc, key)
+            if (None if value is _MISSING else value) != condition:
+                return False
+    return True
+
+
+def _project(doc: Dict, projection: Optional[Dict]) -> Dict:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    include_id = projection.get("_id", 1)
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if fields and all(fields.values()):
+        out = {}
+        for path in fields:
+            value = _get_path(doc, path)
+            if value is not _MISSING:
+                _set_path(out, path, value)
+        if include_id and "_id" in doc:
+            out["_id"] = doc["_id"]
+        return out
+    for path in fields:
+        _unset_path(doc, path)
+    if not include_id:
+        doc.pop("_id", None)
+    return doc
+
+
+def _apply_update(doc: Dict, update: Dict, inserting: bool) -> None:
+    for op, fields in update.items():
+        if op == "$set":
+            for path, value in fields.items():
+                _set_path(doc, path, copy.deepcopy(value))
+        elif op == "$setOnInsert":
+            if inserting:
+                for path, value in fields.items():
+                    _set_path(doc, path, copy.deepcopy(value))
+        elif op == "$unset":
+            for path in fields:
+                _unset_path(doc, path)
+        elif op == "$inc":
+            for path, amount in fields.items():
+                current = _get_path(doc, path)
+                _set_path(doc, path, (0 if current is _MISSING else current) + amount)
+        else:
+            raise NotImplementedError(f"Update operator {op} is not supported")
+
+
+def _sort_fields(key_or_list, direction: Optional[int] = None) -> List[Tuple[str, int]]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    return list(key_or_list)
+
+
+def _sorted(docs: List[Dict], fields: Sequence[Tuple[str, int]]) -> List[Dict]:
+    # Stable sorts applied from the least to the most significant key; missing sorts first
+    for path, direction in reversed(fields):
+        def key(doc, path=path):
+            value = _get_path(doc, path)
+            return (False, None) if value is _MISSING or value is None else (True, value)
+        docs.sort(key=key, reverse=direction < 0)
+    return docs
+
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+        self.acknowledged = True
+
+
+class UpdateResult:
+    def __init__(self, matched_count: int, modified_count: int, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+        self.acknowledged = True
+
+
+class DeleteResult:
+    def __init__(self, deleted_count: int):
+        self.deleted_count = deleted_count
+        self.acknowledged = True
+
+
+class BulkWriteResult:
+    def __init__(self, inserted_count: int, matched_count: int, modified_count: int, deleted_count: int):
+        self.inserted_count = inserted_count
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.deleted_count = deleted_count
+        self.acknowledged = True
+
+
+class FakeCursor:
+    def __init__(self, collection: "FakeCollection", query: Dict, projection: Optional[Dict]):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[List[Dict]] = None
+
+    def sort(self, key_or_list, direction: Optional[int] = None) -> "FakeCursor":
+        self._sort.extend(_sort_fields(key_or_list, direction))
+        return self
+
+    def skip(self, count: int) -> "FakeCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "FakeCursor":
+        self._limit = count
+        return self
+
+    def _evaluate(self) -> List[Dict]:
+        docs = [doc for doc in self._collection._docs.values() if matches(doc, self._query)]
+        docs = _sorted(docs, self._sort)[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [_project(doc, self._projection) for doc in docs]
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        await self._collection._round_trip()
+        docs = self._evaluate()
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict:
+        if self._results is None:
+            await self._collection._round_trip()
+            self._results = self._evaluate()
+        if not self._results:
+            raise StopAsyncIteration
+        return self._results.pop(0)
+
+
+class FakeCollection:
+    def __init__(self, name: str, latency: float):
+        self.name = name
+        self._latency = latency
+        self._docs: Dict[Any, Dict] = {}
+        self._unique: List[Tuple[str, ...]] = []
+        self._index_names: set = set()
+
+    async def _round_trip(self) -> None:
+        await asyncio.sleep(self._latency)
+
+    def _check_unique(self, doc: Dict, exclude_id: Any = _MISSING) -> None:
+        if doc["_id"] in self._docs and doc["_id"] != exclude_id:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_", 11000)
+        for fields in self._unique:
+            key = tuple(_get_path(doc, f) for f in fields)
+            if all(k is _MISSING for k in key):
+                continue
+            for other_id, other in self._docs.items():
+                if other_id != exclude_id and tuple(_get_path(other, f) for f in fields) == key:
+                    raise DuplicateKeyError(
+                        f"E11000 duplicate key error collection: {self.name} index: {'_'.join(fields)}", 11000,
+                        details={"keyPattern": {f: 1 for f in fields}},
+                    )
+
+    def _first(self, query: Dict, sort=None) -> Optional[Dict]:
+        docs = (doc for doc in self._docs.values() if matches(doc, query))
+        if not sort:
+            return next(docs, None)
+        docs = _sorted(list(docs), _sort_fields(sort))
+        return docs[0] if docs else None
+
+    def _insert(self, doc: Dict) -> Any:
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", ObjectId())
+        self._check_unique(doc)
+        self._docs[doc["_id"]] = doc
+        return doc["_id"]
+
+    def _upsert_doc(self, query: Dict, update: Dict) -> Dict:
+        doc = {k: copy.deepcopy(v) for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+        _apply_update(doc, update, inserting=True)
+        return doc
+
+    def _update(self, doc: Dict, update: Dict) -> Dict:
+        updated = copy.deepcopy(doc)
+        _apply_update(updated, update, inserting=False)
+        self._check_unique(updated, exclude_id=doc["_id"])
+        self._docs[doc["_id"]] = updated
+        return updated
+
+    async def create_index(self, keys, unique: bool = False, name: Optional[str] = None, **kwargs) -> str:
+        await self._round_trip()
+        fields = (keys,) if isinstance(keys, str) else tuple(k for k, _ in keys)
+        if unique and fields not in self._unique:
+            self._unique.append(fields)
+        name = name or "_".join(f"{f}_1" for f in fields)
+        self._index_names.add(name)
+        return name
+
+    async def drop_index(self, name: str) -> None:
+        # Unique constraints are not tracked by name; dropping only forgets the name
+        await self._round_trip()
+        if name not in self._index_names:
+            raise OperationFailure(f"index not found with name [{name}]", code=27)
+        self._index_names.discard(name)
+
+    async def find_one(self, query: Optional[Dict] = None, projection: Optional[Dict] = None, sort=None) -> Optional[Dict]:
+        await self._round_trip()
+        doc = self._first(query or {}, sort)
+        return _project(doc, projection) if doc is not None else None
+
+    def find(self, query: Optional[Dict] = None, projection: Optional[Dict] = None) -> FakeCursor:
+        return FakeCursor(self, query or {}, projection)
+
+    async def count_documents(self, query: Dict) -> int:
+        await self._round_trip()
+        return sum(matches(doc, query) for doc in self._docs.values())
+
+    async def insert_one(self, doc: Dict) -> InsertOneResult:
+        await self._round_trip()
+        inserted_id = self._insert(doc)
+        # Motor sets _id on the caller's document as well
+        doc.setdefault("_id", inserted_id)
+        return InsertOneResult(inserted_id)
+
+    async def update_one(self, query: Dict, update: Dict, upsert: bool = False) -> UpdateResult:
+        await self._round_trip()
+        return self._update_one(query, update, upsert)
+
+    def _update_one(self, query: Dict, update: Dict, upsert: bool) -> UpdateResult:
+        doc = self._first(query)
+        if doc is not None:
+            self._update(doc, update)
+            return UpdateResult(1, 1)
+        if upsert:
+            return UpdateResult(0, 0, self._insert(self._upsert_doc(query, update)))
+        return UpdateResult(0, 0)
+
+    async def update_many(self, query: Dict, update: Dict) -> UpdateResult:
+        await self._round_trip()
+        docs = [doc for doc in self._docs.values() if matches(doc, query)]
+        for doc in docs:
+            self._update(doc, update)
+        return UpdateResult(len(docs), len(docs))
+
+    async def find_one_and_update(
+        self,
+        query: Dict,
+        update: Dict,
+        projection: Optional[Dict] = None,
+        upsert: bool = False,
+        return_document: bool = ReturnDocument.BEFORE,
+        sort=None,
+    ) -> Optional[Dict]:
+        await self._round_trip()
+        doc = self._first(query, sort)
+        if doc is None:
+            if not upsert:
+                return None
+            new_id = self._insert(self._upsert_doc(query, update))
+            return _project(self._docs[new_id], projection) if return_document == ReturnDocument.AFTER else None
+        updated = self._update(doc, update)
+        return _project(updated if return_document == ReturnDocument.AFTER else doc, projection)
+
+    async def find_one_and_delete(self, query: Dict, projection: Optional[Dict] = None) -> Optional[Dict]:
+        await self._round_trip()
+        doc = self._first(query)
+        if doc is None:
+            return None
+        del self._docs[doc["_id"]]
+        return _project(doc, projection)
+
+    async def delete_one(self, query: Dict) -> DeleteResult:
+        await self._round_trip()
+        doc = self._first(query)
+        if doc is None:
+            return DeleteResult(0)
+        del self._docs[doc["_id"]]
+        return DeleteResult(1)
+
+    async def delete_many(self, query: Dict) -> DeleteResult:
+        await self._round_trip()
+        ids = [doc_id for doc_id, doc in self._docs.items() if matches(doc, query)]
+        for doc_id in ids:
+            del self._docs[doc_id]
+        return DeleteResult(len(ids))
+
+    async def bulk_write(self, requests: Iterable, ordered: bool = True) -> BulkWriteResult:
+        await self._round_trip()
+        inserted = matched = modified = deleted = 0
+        for request in requests:
+            try:
+                if isinstance(request, UpdateOne):
+                    result = self._update_one(request._filter, request._doc, request._upsert)
+                    matched += result.matched_count
+                    modified += result.modified_count
+                elif isinstance(request, InsertOne):
+                    self._insert(request._doc)
+                    inserted += 1
+                elif isinstance(request, DeleteOne):
+                    doc = self._first(request._filter)
+                    if doc is not None:
+                        del self._docs[doc["_id"]]
+                        deleted += 1
+                else:
+                    raise NotImplementedError(f"{type(request).__name__} is not supported")
+            except DuplicateKeyError:
+                if ordered:
+                    raise
+        return BulkWriteResult(inserted, matched, modified, deleted)
+
+
+class FakeDatabase:
+    def __init__(self, name: str, latency: float):
+        self.name = name
+        self._latency = latency
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name, self._latency)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, command, *args, **kwargs) -> Dict:
+        await asyncio.sleep(self._latency)
+        return {"ok": 1.0}
+
+
+class FakeMongoClient:
+    """``AsyncIOMotorClient`` look-alike; ``latency_ms`` is added to every operation."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self._latency = latency_ms / 1000.0
+        self._databases: Dict[str, FakeDatabase] = {}
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        if name not in self._databases:
+            self._databases[name] = FakeDatabase(name, self._latency)
+        return self._databases[name]
+
+    def __getattr__(self, name: str) -> FakeDatabase:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def close(self) -> None:
+        pass
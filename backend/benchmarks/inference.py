@@ -0,0 +1,216 @@
+"""
+End-to-end inference benchmark for ``app.ml.inference``.
+
+Measures, in this process:
+
+- cold load: building and warming up the served model (``model_registry.load``);
+- for every batch size x torch thread count: latency of one ``predict``
+  (batch size 1) or ``predict_batch`` call (p50/p95/p99, ms), per-image
+  latency, images/sec and the stage breakdown reported by ``predict_batch``;
+- peak RSS of the process after each configuration (a high-water mark, so it
+  only grows).
+
+Images come from ``--images-dir`` or are generated synthetically (seeded, so
+every run uses identical inputs). The report is written as JSON together
+with the environment it ran in; pass ``--baseline`` with an earlier report
+to print throughput and p95 ratios against it.
+
+Tensor sidecars are disabled unless ``PREPROCESSED_TENSOR_CACHE_ENABLED`` is
+set explicitly, so every call decodes its images and the first repeat does
+not leave files in the image directory.
+
+    python -m benchmarks.inference --batch-sizes 1,8,32 --threads 1,4 --output bench.json
+    python -m benchmarks.inference --images-dir data/holdout --baseline bench.json
+"""
+
+import os
+
+os.environ.setdefault("PREPROCESSED_TENSOR_CACHE_ENABLED", "false")
+
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import torch
+
+from app.ml.inference import DEVICE, QUANTIZATION_MODE, model_registry, predict, predict_batch
+from app.ml.preprocess import JPEG_DRAFT_ENABLED, TENSOR_CACHE_ENABLED
+from app.ml.quantization import list_images
+from benchmarks.common import percentile, synthetic_images
+
+
+def _parse_ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _environment() -> Dict:
+    return {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "device": str(DEVICE),
+        "quantization": QUANTIZATION_MODE,
+        "jpeg_draft": JPEG_DRAFT_ENABLED,
+        "tensor_cache": TENSOR_CACHE_ENABLED,
+    }
+
+
+def _run_config(paths: Sequence[str], batch_size: int, threads: int, repeat: int, warmup: int) -> Dict:
+    torch.set_num_threads(threads)
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    # batch size 1 goes through predict(), the single-image entry point
+    call = (lambda batch: predict(batch[0])) if batch_size == 1 else predict_batch
+
+    for batch in batches[:warmup]:
+        call(batch)
+
+    latencies: List[float] = []
+    stages: Dict[str, float] = {}
+    images = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for batch in batches:
+            call_started = time.perf_counter()
+            if batch_size == 1:
+                call(batch)
+            else:
+                for stage, seconds in (call(batch)[0].timings or {}).items():
+                    stages[stage] = stages.get(stage, 0.0) + seconds
+            latencies.append(time.perf_counter() - call_started)
+            images += len(batch)
+    elapsed = time.perf_counter() - started
+
+    report = {
+        "batch_size": batch_size,
+        "threads": threads,
+        "calls": len(latencies),
+        "images": images,
+        "images_per_sec": round(images / elapsed, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3),
+        },
+        "ms_per_image": round(elapsed * 1000 / images, 3),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    if stages:
+        report["stage_ms_per_image"] = {stage: round(seconds * 1000 / images, 3) for stage, seconds in stages.items()}
+    return report
+
+
+def run(
+    paths: Sequence[Path],
+    batch_sizes: Sequence[int],
+    thread_counts: Sequence[int],
+    repeat: int = 3,
+    warmup: int = 1,
+) -> Dict:
+    paths = [str(p) for p in paths]
+    rss_before = _peak_rss_mb()
+    started = time.perf_counter()
+    loaded = model_registry.load()
+    cold_load = time.perf_counter() - started
+    model_registry.swap(loaded)
+
+    results = []
+    for threads in thread_counts:
+        for batch_size in batch_sizes:
+            result = _run_config(paths, batch_size, threads, repeat, warmup)
+            print(
+                f"batch={batch_size:<3} threads={threads:<2} {result['images_per_sec']:>8.1f} img/s  "
+                f"p50={result['latency_ms']['p50']:.1f}ms p95={result['latency_ms']['p95']:.1f}ms "
+                f"p99={result['latency_ms']['p99']:.1f}ms",
+                file=sys.stderr,
+            )
+            results.append(result)
+
+    return {
+        "environment": _environment(),
+        "model_version": loaded.version,
+        "images": len(paths),
+        "repeat": repeat,
+        "cold_load_s": round(cold_load, 3),
+        "rss_before_load_mb": rss_before,
+        "peak_rss_mb": _peak_rss_mb(),
+        "results": results,
+    }
+
+
+def compare(report: Dict, baseline: Dict) -> List[Dict]:
+    """Per-configuration ratios (current / baseline) for throughput and p95 latency."""
+    previous = {(r["batch_size"], r["threads"]): r for r in baseline.get("results", [])}
+    rows = []
+    for result in report["results"]:
+        before = previous.get((result["batch_size"], result["threads"]))
+        if before is None:
+            continue
+        rows.append({
+            "batch_size": result["batch_size"],
+            "threads": result["threads"],
+            "images_per_sec_ratio": round(result["images_per_sec"] / before["images_per_sec"], 3),
+            "p95_ratio": round(result["latency_ms"]["p95"] / before["latency_ms"]["p95"], 3),
+        })
+    return rows
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark model inference latency and throughput")
+    parser.add_argument("--images-dir", type=Path, help="Local images; synthetic images are generated if omitted")
+    parser.add_argument("--max-images", type=int, default=0)
+    parser.add_argument("--synthetic-count", type=int, default=64)
+    parser.add_argument("--synthetic-size", type=int, default=512, help="Edge length of synthetic images")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-sizes", type=_parse_ints, default=[1, 8, 32])
+    parser.add_argument("--threads", type=_parse_ints, default=[torch.get_num_threads()])
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the image set per configuration")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed calls before each configuration")
+    parser.add_argument("--output", type=Path, default=Path("inference_benchmark.json"))
+    parser.add_argument("--baseline", type=Path, help="Earlier report to compare against")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.images_dir:
+            paths = list_images(args.images_dir, args.max_images)
+            source = {"images_dir": str(args.images_dir)}
+        else:
+            paths = synthetic_images(Path(tmp), args.synthetic_count, args.synthetic_size, args.seed)
+            source = {"synthetic_size": args.synthetic_size, "seed": args.seed}
+        report = run(paths, args.batch_sizes, args.threads, args.repeat, args.warmup)
+    report["source"] = source
+
+    if args.baseline:
+        report["comparison"] = compare(report, json.loads(args.baseline.read_text()))
+    args.output.write_text(json.dumps(report, indent=2))
+    print(json.dumps(report.get("comparison", report), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+HTTP load test of the whole FastAPI app, without MongoDB or SMTP.
+
+The app is booted in this process against ``benchmarks.fake_mongo`` (with
+``--db-latency-ms`` added to every database call), the verification email
+and the Overpass lookup are stubbed, and requests go through
+``httpx.ASGITransport``, so every middleware, dependency, router and the
+inference path (worker pool, batcher, caches) run as in production;
+only the socket and the database are simulated. Uploads land in a
+temporary directory.
+
+``--concurrency`` virtual clients run for ``--duration`` seconds, each
+repeatedly picking an operation from ``--mix`` (relative weights) as one of
+``--users`` seeded, verified accounts:
+
+    login    POST /auth/login (bcrypt verify)
+    signup   POST /auth/signup (a new account every time)
+    me       GET  /auth/me
+    doctors  GET  /auth/doctors/nearby (Overpass stubbed)
+    upload   POST /image/upload
+    analyze  POST /image/analyze
+    predict  POST /image/predict/{image_id} (uploads first if the user has no image yet)
+    history  GET  /image/history
+
+The report has per-operation throughput, error counts and p50/p95/p99/max
+latency, plus the mean server-side time per request and inference stage
+from ``/metrics``, which is usually where the bottleneck shows. The client
+shares the event loop and CPU with the app, so absolute numbers are a
+lower bound; compare runs on the same machine.
+
+    python -m benchmarks.loadtest --concurrency 32 --duration 60 --mix login=1,upload=2,predict=4,history=3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import httpx
+
+from benchmarks.common import percentile, synthetic_images
+from benchmarks.fake_mongo import FakeMongoClient
+
+OPERATIONS = ("login", "signup", "me", "doctors", "upload", "analyze", "predict", "history")
+DEFAULT_MIX = "login=1,upload=2,predict=4,history=3"
+PASSWORD = "loadtest-password"
+
+
+def _parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def _boot(db_latency_ms: float):
+    """Import and start the app against the in-memory database. Returns the ``app.main`` module."""
+    import app.database as database
+    import app.main as main
+    from app.routers import auth
+
+    async def connect_to_fake_mongo():
+        database.client = FakeMongoClient(latency_ms=db_latency_ms)
+        database.database = database.client[database.DATABASE_NAME]
+        # The stand-in enforces unique indexes, so duplicate signups fail as they would in production
+        await database.ensure_indexes(database.database)
+
+    async def send_verification_email(email: str, token: str, username: str):
+        return None
+
+    async def fetch_nearby_doctors(lat: float, lng: float, radius_km: int = 15, max_results: int = 20):
+        return []
+
+    database.connect_to_mongo = connect_to_fake_mongo
+    main.connect_to_mongo = connect_to_fake_mongo
+    auth.send_verification_email = send_verification_email
+    auth.fetch_nearby_doctors = fetch_nearby_doctors
+
+    await main.startup_event()
+    started = time.perf_counter()
+    while not main.inference_ready():
+        if main.inference_error():
+            raise RuntimeError(f"Inference failed to start: {main.inference_error()}")
+        await asyncio.sleep(0.1)
+    print(f"App ready in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return main
+
+
+async def _seed_users(count: int) -> List[Dict]:
+    from app.database import get_database
+    from app.utils.auth import get_password_hash
+
+    db = get_database()
+    hashed = get_password_hash(PASSWORD)
+    users = []
+    for i in range(count):
+        user = {
+            "user_id": str(uuid.uuid4()),
+            "username": f"loadtest{i}",
+            "email": f"loadtest{i}@example.org",
+            "role": "patient",
+            "age": 40,
+            "phone_number": "+15550000000",
+            "hashed_password": hashed,
+            "is_verified": True,
+            "verification_token": None,
+            "verification_token_expiry": None,
+            "created_at": datetime.utcnow(),
+        }
+        await db.users.insert_one(dict(user))
+        users.append({"email": user["email"], "token": None, "image_ids": []})
+    return users
+
+
+class VirtualClient:
+    def __init__(self, client: httpx.AsyncClient, users: List[Dict], images: List[bytes], rng: random.Random):
+        self.client = client
+        self.users = users
+        self.images = images
+        self.rng = rng
+
+    def _auth(self, user: Dict) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {user['token']}"}
+
+    def _image_file(self):
+        return {"file": ("loadtest.jpg", self.rng.choice(self.images), "image/jpeg")}
+
+    async def login(self, user: Dict) -> httpx.Response:
+        response = await self.client.post("/auth/login", json={"email": user["email"], "password": PASSWORD})
+        if response.status_code == 200:
+            user["token"] = response.json()["access_token"]
+        return response
+
+    async def signup(self, user: Dict) -> httpx.Response:
+        name = f"signup{uuid.uuid4().hex[:12]}"
+        return await self.client.post("/auth/signup", json={
+            "username": name,
+            "email": f"{name}@example.org",
+            "password": PASSWORD,
+            "role": "patient",
+            "age": 40,
+            "phone_number": "+15550000000",
+        })
+
+    async def me(self, user: Dict) -> httpx.Response:
+        return await self.client.get("/auth/me", headers=self._auth(user))
+
+    async def doctors(self, user: Dict) -> httpx.Response:
+        return await self.client.get(
+            "/auth/doctors/nearby", params={"lat": 31.5, "lng": 74.3}, headers=self._auth(user)
+        )
+
+    async def upload(self, user: Dict) -> httpx.Response:
+        response = await self.client.post("/image/upload", files=self._image_file(), headers=self._auth(user))
+        if response.status_code == 200:
+            user["image_ids"].append(response.json()["image_id"])
+        return response
+
+    async def analyze(self, user: Dict) -> httpx.Response:
+        response = await self.client.post("/image/analyze", files=self._image_file(), headers=self._auth(user))
+        if response.status_code == 200:
+            user["image_ids"].append(response.json()["image_id"])
+        return response
+
+    async def predict(self, user: Dict) -> httpx.Response:
+        image_id = self.rng.choice(user["image_ids"])
+        return await self.client.post(f"/image/predict/{image_id}", headers=self._auth(user))
+
+    async def history(self, user: Dict) -> httpx.Response:
+        return await self.client.get("/image/history", headers=self._auth(user))
+
+    async def run(self, mix: Dict[str, float], deadline: float, samples: List[Tuple[str, int, float]]) -> None:
+        names, weights = list(mix), list(mix.values())
+        while time.perf_counter() < deadline:
+            user = self.rng.choice(self.users)
+            operation = self.rng.choices(names, weights)[0]
+            if operation not in ("login", "signup") and user["token"] is None:
+                operation = "login"
+            elif operation == "predict" and not user["image_ids"]:
+                operation = "upload"
+            started = time.perf_counter()
+            try:
+                response = await getattr(self, operation)(user)
+                status_code = response.status_code
+            except Exception:
+                status_code = 0
+            samples.append((operation, status_code, time.perf_counter() - started))
+
+
+def _summarize(samples: List[Tuple[str, int, float]], elapsed: float) -> Dict[str, Dict]:
+    by_operation: Dict[str, List[Tuple[int, float]]] = {}
+    for operation, status_code, latency in samples:
+        by_operation.setdefault(operation, []).append((status_code, latency))
+    by_operation["total"] = [(status_code, latency) for _, status_code, latency in samples]
+
+    summary = {}
+    for operation, results in sorted(by_operation.items()):
+        latencies = [latency for _, latency in results]
+        statuses: Dict[str, int] = {}
+        for status_code, _ in results:
+            statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+        summary[operation] = {
+            "requests": len(results),
+            "errors": sum(1 for status_code, _ in results if not 200 <= status_code < 400),
+            "statuses": statuses,
+            "requests_per_sec": round(len(results) / elapsed, 2),
+            "latency_ms": {
+                "p50": round(percentile(latencies, 50) * 1000, 2),
+                "p95": round(percentile(latencies, 95) * 1000, 2),
+                "p99": round(percentile(latencies, 99) * 1000, 2),
+                "max": round(max(latencies) * 1000, 2),
+            },
+        }
+    return summary
+
+
+def _stage_means(metrics_text: str, metric: str) -> Dict[str, float]:
+    """Mean milliseconds per ``stage`` label of a histogram in Prometheus text format."""
+    sums: Dict[str, float] = {}
+    counts: Dict[str, float] = {}
+    pattern = re.compile(rf'^{metric}_(sum|count)\{{stage="([^"]+)"\}} (\S+)$')
+    for line in metrics_text.splitlines():
+        match = pattern.match(line)
+        if match:
+            kind, stage, value = match.groups()
+            (sums if kind == "sum" else counts)[stage] = float(value)
+    return {stage: round(sums[stage] / counts[stage] * 1000, 3) for stage in sums if counts.get(stage)}
+
+
+async def run(
+    images: List[bytes],
+    mix: Dict[str, float],
+    users: int = 20,
+    concurrency: int = 16,
+    duration: float = 30.0,
+    db_latency_ms: float = 1.0,
+    seed: int = 0,
+) -> Dict:
+    app_main = await _boot(db_latency_ms)
+    try:
+        seeded = await _seed_users(users)
+        transport = httpx.ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            samples: List[Tuple[str, int, float]] = []
+            started = time.perf_counter()
+            deadline = started + duration
+            await asyncio.gather(*[
+                VirtualClient(client, seeded, images, random.Random(seed + i)).run(mix, deadline, samples)
+                for i in range(concurrency)
+            ])
+            elapsed = time.perf_counter() - started
+            metrics_text = (await client.get("/metrics")).text
+    finally:
+        await app_main.shutdown_event()
+
+    return {
+        "config": {
+            "users": users,
+            "concurrency": concurrency,
+            "duration_s": duration,
+            "db_latency_ms": db_latency_ms,
+            "mix": mix,
+            "seed": seed,
+            "images": len(images),
+        },
+        "elapsed_s": round(elapsed, 2),
+        "operations": _summarize(samples, elapsed),
+        "server_request_stage_ms": _stage_means(metrics_text, "prediction_request_stage_seconds"),
+        "server_inference_stage_ms_per_batch": _stage_means(metrics_text, "inference_stage_seconds"),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Load-test the API in-process against an in-memory database")
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix(DEFAULT_MIX),
+                        help=f"Operation weights, e.g. {DEFAULT_MIX}")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--db-latency-ms", type=float, default=1.0, help="Added to every database call")
+    parser.add_argument("--images-dir", type=Path, help="Images to upload; synthetic JPEGs if omitted")
+    parser.add_argument("--synthetic-count", type=int, default=16)
+    parser.add_argument("--synthetic-size", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=Path("loadtest.json"))
+    args = parser.parse_args(argv)
+    output = args.output.resolve()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.images_dir:
+            from app.ml.quantization import list_images
+
+            paths = list_images(args.images_dir)
+        else:
+            paths = synthetic_images(Path(tmp), args.synthetic_count, args.synthetic_size, args.seed)
+        images = [Path(p).read_bytes() for p in paths]
+
+        # The app stores uploads under ./uploads; keep them out of the working tree
+        workdir = Path(tmp) / "app"
+        workdir.mkdir()
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            report = asyncio.run(run(
+                images, args.mix, args.users, args.concurrency, args.duration, args.db_latency_ms, args.seed,
+            ))
+        finally:
+            os.chdir(cwd)
+
+    output.write_text(json.dumps(report, indent=2))
+    for operation, stats in report["operations"].items():
+        latency = stats["latency_ms"]
+        print(
+            f"{operation:<8} {stats['requests']:>6} req {stats['requests_per_sec']:>8.1f}/s "
+            f"{stats['errors']:>4} err  p50={latency['p50']:.1f}ms p95={latency['p95']:.1f}ms "
+            f"p99={latency['p99']:.1f}ms max={latency['max']:.1f}ms"
+        )
+    print(f"Server request stages (mean ms): {report['server_request_stage_ms']}")
+    print(f"Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
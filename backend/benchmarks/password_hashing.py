@@ -0,0 +1,111 @@
+"""
+Event-loop lag under a login storm: bcrypt verification called inline in
+a coroutine (how ``login`` used to do it) against ``verify_password_async``
+on the password hashing pool.
+
+A probe task asks to wake up every ``--probe-interval-ms`` and records how
+late it actually ran, which is the delay every other request on the loop
+(uploads, predictions, health checks) would see. Reports lag percentiles
+and login throughput per mode.
+
+    python -m benchmarks.password_hashing --logins 64 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+from app.utils.auth import (
+    PASSWORD_HASH_MAX_CONCURRENCY,
+    PASSWORD_HASH_WORKERS,
+    get_password_hash,
+    shutdown_password_hashing,
+    verify_password,
+    verify_password_async,
+)
+from benchmarks.common import percentile
+
+PASSWORD = "benchmark-password"
+
+
+async def _inline_verify(hashed: str) -> bool:
+    return verify_password(PASSWORD, hashed)
+
+
+async def _offloaded_verify(hashed: str) -> bool:
+    return await verify_password_async(PASSWORD, hashed)
+
+
+async def _probe(interval: float, lags: List[float], stop: asyncio.Event) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def _storm(verify, hashed: str, logins: int, concurrency: int, interval: float) -> Dict:
+    lags: List[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(interval, lags, stop))
+    await asyncio.sleep(interval * 2)
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with slots:
+            if not await verify(hashed):
+                raise RuntimeError("Password verification failed")
+
+    started = time.perf_counter()
+    await asyncio.gather(*[login() for _ in range(logins)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    return {
+        "logins_per_sec": round(logins / elapsed, 2),
+        "elapsed_s": round(elapsed, 3),
+        "loop_lag_ms": {
+            "p50": round(percentile(lags, 50) * 1000, 2),
+            "p95": round(percentile(lags, 95) * 1000, 2),
+            "p99": round(percentile(lags, 99) * 1000, 2),
+            "max": round(max(lags) * 1000, 2),
+        },
+        "probes": len(lags),
+    }
+
+
+async def run(logins: int = 64, concurrency: int = 32, probe_interval_ms: float = 5.0) -> Dict:
+    interval = probe_interval_ms / 1000.0
+    hashed = get_password_hash(PASSWORD)
+    started = time.perf_counter()
+    verify_password(PASSWORD, hashed)
+    single = time.perf_counter() - started
+    try:
+        return {
+            "single_verify_ms": round(single * 1000, 2),
+            "hash_workers": PASSWORD_HASH_WORKERS,
+            "hash_max_concurrency": PASSWORD_HASH_MAX_CONCURRENCY,
+            "logins": logins,
+            "concurrency": concurrency,
+            "inline": await _storm(_inline_verify, hashed, logins, concurrency, interval),
+            "offloaded": await _storm(_offloaded_verify, hashed, logins, concurrency, interval),
+        }
+    finally:
+        shutdown_password_hashing()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Measure event-loop lag during concurrent password verification")
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=32, help="Logins in flight at once")
+    parser.add_argument("--probe-interval-ms", type=float, default=5.0)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run(args.logins, args.concurrency, args.probe_interval_ms)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
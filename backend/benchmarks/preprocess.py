@@ -0,0 +1,107 @@
+"""
+Preprocessing benchmark and parity check: the per-image PIL ``_transform``
+against the batched tensor pipeline in ``app.ml.preprocess``.
+
+Both paths decode at full resolution here so only the transform differs
+(``benchmarks.decode`` covers draft decoding). Exits non-zero if any
+element differs from ``_transform`` by more than ``PARITY_TOLERANCE``.
+The ``normalize`` timings isolate the tensor stage on already-cropped images.
+
+    python -m benchmarks.preprocess --images-dir data/holdout --batch-size 32
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import torch
+from torchvision import transforms
+
+from torchvision.transforms import functional as F
+
+from app.ml.inference import _transform
+from app.ml.preprocess import (
+    PARITY_TOLERANCE,
+    _resize_crop,
+    decode_image,
+    normalize_,
+    preprocess_images,
+    preprocess_paths,
+)
+from app.ml.quantization import list_images
+
+
+def _best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _chunks(items: Sequence, size: int) -> List[Sequence]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def run(paths: Sequence[Path], batch_size: int = 32, repeat: int = 3) -> Dict:
+    paths = [str(p) for p in paths]
+    images = [decode_image(p, draft=False) for p in paths]
+    cropped = [_resize_crop(img) for img in images]
+
+    reference = torch.stack([_transform(img) for img in images])
+    candidate = torch.cat([preprocess_images(chunk) for chunk in _chunks(images, batch_size)])
+    diff = (reference - candidate).abs()
+
+    n = len(paths)
+    to_tensor_normalize = transforms.Compose(_transform.transforms[2:])
+    normalize_ref = _best_of(repeat, lambda: [
+        torch.stack([to_tensor_normalize(img) for img in chunk]) for chunk in _chunks(cropped, batch_size)
+    ])
+    normalize_new = _best_of(repeat, lambda: [
+        normalize_(torch.stack([F.pil_to_tensor(img) for img in chunk]).float()) for chunk in _chunks(cropped, batch_size)
+    ])
+    end_to_end_ref = _best_of(repeat, lambda: [
+        torch.stack([_transform(decode_image(p, draft=False)) for p in chunk]) for chunk in _chunks(paths, batch_size)
+    ])
+    end_to_end_new = _best_of(repeat, lambda: [
+        preprocess_paths(chunk, draft=False, use_cache=False) for chunk in _chunks(paths, batch_size)
+    ])
+    return {
+        "images": n,
+        "distinct_sizes": len({img.size for img in images}),
+        "batch_size": batch_size,
+        "max_abs_diff": round(diff.max().item(), 6),
+        "mean_abs_diff": round(diff.mean().item(), 6),
+        "tolerance": round(PARITY_TOLERANCE, 6),
+        "parity_ok": diff.max().item() <= PARITY_TOLERANCE,
+        "normalize_images_per_sec": {
+            "pil": round(n / normalize_ref, 1),
+            "batched": round(n / normalize_new, 1),
+        },
+        "decode_and_transform_images_per_sec": {
+            "pil": round(n / end_to_end_ref, 1),
+            "batched": round(n / end_to_end_new, 1),
+        },
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark batched preprocessing against _transform")
+    parser.add_argument("--images-dir", type=Path, required=True)
+    parser.add_argument("--max-images", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per path; the best is reported")
+    args = parser.parse_args(argv)
+
+    report = run(list_images(args.images_dir, args.max_images), args.batch_size, args.repeat)
+    print(json.dumps(report, indent=2))
+    if not report["parity_ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
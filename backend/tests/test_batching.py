@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import unittest
+
+from app.ml.batching import MicroBatcher
+
+
+class RecordingRunner:
+    """Stub for predict_batch: upper-cases items, fails any batch containing "bad"."""
+
+    def __init__(self):
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def __call__(self, items):
+        with self._lock:
+            self.batches.append(list(items))
+        if "bad" in items:
+            raise ValueError("cannot decode bad")
+        return [item.upper() for item in items]
+
+
+class MicroBatcherTest(unittest.IsolatedAsyncioTestCase):
+    async def _start(self, runner, **kwargs):
+        batcher = MicroBatcher(runner, **kwargs)
+        await batcher.start()
+        self.addAsyncCleanup(batcher.stop)
+        return batcher
+
+    async def test_concurrent_submits_are_batched_up_to_the_limit(self):
+        runner = RecordingRunner()
+        batcher = await self._start(runner, max_batch_size=4, max_wait_ms=50)
+        items = [f"img{i}" for i in range(10)]
+
+        results = await asyncio.gather(*[batcher.submit(item) for item in items])
+
+        self.assertEqual(results, [item.upper() for item in items])
+        self.assertTrue(all(len(batch) <= 4 for batch in runner.batches))
+        self.assertLess(len(runner.batches), len(items))
+        self.assertEqual(sorted(item for batch in runner.batches for item in batch), sorted(items))
+
+    async def test_failing_item_fails_only_its_own_future(self):
+        runner = RecordingRunner()
+        batcher = await self._start(runner, max_batch_size=8, max_wait_ms=50)
+
+        results = await asyncio.gather(
+            *[batcher.submit(item) for item in ("a", "bad", "c")], return_exceptions=True
+        )
+
+        self.assertEqual(results[0], "A")
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], "C")
+        # The failed batch, then each of its items on its own
+        self.assertEqual(runner.batches[0], ["a", "bad", "c"])
+        self.assertCountEqual(runner.batches[1:], [["a"], ["bad"], ["c"]])
+
+    async def test_single_failing_item_is_not_retried(self):
+        runner = RecordingRunner()
+        batcher = await self._start(runner, max_batch_size=8, max_wait_ms=0)
+
+        with self.assertRaises(ValueError):
+            await batcher.submit("bad")
+        self.assertEqual(runner.batches, [["bad"]])
+
+    async def test_stop_resolves_queued_items(self):
+        runner = RecordingRunner()
+        batcher = MicroBatcher(runner, max_batch_size=2, max_wait_ms=1000)
+        await batcher.start()
+        pending = [asyncio.ensure_future(batcher.submit(item)) for item in ("a", "b", "c")]
+        await asyncio.sleep(0)
+
+        await batcher.stop()
+
+        self.assertEqual([future.result() for future in pending], ["A", "B", "C"])
+
+    async def test_submit_requires_a_running_batcher(self):
+        with self.assertRaises(RuntimeError):
+            await MicroBatcher(RecordingRunner()).submit("a")
+
+    def test_rejects_empty_batches(self):
+        with self.assertRaises(ValueError):
+            MicroBatcher(RecordingRunner(), max_batch_size=0)
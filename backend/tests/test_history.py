@@ -0,0 +1,73 @@
+import base64
+import json
+import unittest
+from datetime import datetime
+
+from fastapi import HTTPException
+
+from app.utils.history import decode_history_cursor, encode_history_cursor, etag_matches, history_etag
+
+
+class HistoryCursorTest(unittest.TestCase):
+    def test_round_trip(self):
+        upload_date = datetime(2024, 5, 17, 9, 30, 15, 123456)
+        token = encode_history_cursor({"upload_date": upload_date, "image_id": "b7e1"})
+
+        self.assertNotIn("=", token)
+        self.assertEqual(decode_history_cursor(token), {"$or": [
+            {"upload_date": {"$lt": upload_date}},
+            {"upload_date": upload_date, "image_id": {"$lt": "b7e1"}},
+        ]})
+
+    def test_rejects_malformed_cursors(self):
+        def encode(value):
+            return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+        for token in (
+            "",
+            "not base64!",
+            base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+            encode("2024-05-17T09:30:15"),
+            encode(["2024-05-17T09:30:15"]),
+            encode(["yesterday", "b7e1"]),
+            encode([20240517, "b7e1"]),
+            encode(["2024-05-17T09:30:15", {"$gt": ""}]),
+        ):
+            with self.subTest(token=token):
+                with self.assertRaises(HTTPException) as raised:
+                    decode_history_cursor(token)
+                self.assertEqual(raised.exception.status_code, 400)
+
+
+class HistoryEtagTest(unittest.TestCase):
+    etag = history_etag("user-1", 3, 100, None)
+
+    def test_depends_on_version_and_page(self):
+        self.assertEqual(self.etag, history_etag("user-1", 3, 100, None))
+        for other in (
+            history_etag("user-2", 3, 100, None),
+            history_etag("user-1", 4, 100, None),
+            history_etag("user-1", 3, 50, None),
+            history_etag("user-1", 3, 100, "cursor"),
+        ):
+            self.assertNotEqual(self.etag, other)
+
+    def test_matches_exact_and_weak_tags(self):
+        self.assertTrue(etag_matches(self.etag, self.etag))
+        self.assertTrue(etag_matches(f"W/{self.etag}", self.etag))
+        self.assertTrue(etag_matches(f'"other", W/{self.etag}', self.etag))
+
+    def test_matches_wildcard(self):
+        self.assertTrue(etag_matches("*", self.etag))
+        self.assertTrue(etag_matches(f'"other", *', self.etag))
+
+    def test_no_match(self):
+        self.assertFalse(etag_matches(None, self.etag))
+        self.assertFalse(etag_matches("", self.etag))
+        self.assertFalse(etag_matches('"other"', self.etag))
+        # The quotes are part of the tag
+        self.assertFalse(etag_matches(self.etag.strip('"'), self.etag))
+
+
+if __name__ == "__main__":
+    unittest.main()
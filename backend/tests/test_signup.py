@@ -0,0 +1,41 @@
+import unittest
+
+from pymongo.errors import DuplicateKeyError
+
+from app.routers.auth import DUPLICATE_USER_MESSAGES, _duplicate_user_field
+
+
+def _duplicate_key_error(index: str, key: dict) -> DuplicateKeyError:
+    """What the server reports when an insert violates the unique index ``index``."""
+    message = f"E11000 duplicate key error collection: gastric_cancer_fl.users index: {index} dup key: {key}"
+    return DuplicateKeyError(
+        message,
+        code=11000,
+        details={"index": 0, "code": 11000, "errmsg": message, "keyPattern": {f: 1 for f in key}, "keyValue": key},
+    )
+
+
+class DuplicateUserFieldTest(unittest.TestCase):
+    def test_email_index(self):
+        error = _duplicate_key_error("email_unique", {"email": "a@example.org"})
+        self.assertEqual(_duplicate_user_field(error), "email")
+        self.assertEqual(DUPLICATE_USER_MESSAGES["email"], "Email already registered")
+
+    def test_username_index(self):
+        error = _duplicate_key_error("username_unique", {"username": "alice"})
+        self.assertEqual(_duplicate_user_field(error), "username")
+        self.assertEqual(DUPLICATE_USER_MESSAGES["username"], "Username already taken")
+
+    def test_index_name_without_details(self):
+        # Some drivers/servers only report the index name in the message
+        error = DuplicateKeyError("E11000 duplicate key error index: username_unique dup key: { : \"alice\" }", 11000)
+        self.assertEqual(_duplicate_user_field(error), "username")
+
+    def test_other_indexes_are_not_user_facing(self):
+        for index, key in (("user_id_unique", {"user_id": "u-1"}), ("_id_", {"_id": "x"})):
+            with self.subTest(index=index):
+                self.assertIsNone(_duplicate_user_field(_duplicate_key_error(index, key)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from app.ml import tiling
+
+
+class TilingReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def _save(self, size, fmt):
+        path = os.path.join(self.dir.name, f"slide.{fmt.lower()}")
+        Image.new("RGB", size, (200, 120, 160)).save(path, fmt)
+        return path
+
+    def _reader(self, path):
+        reader = tiling._open_reader(path)
+        self.addCleanup(reader.close)
+        return reader
+
+    def test_small_image_is_decoded_at_full_scale(self):
+        reader = self._reader(self._save((640, 480), "JPEG"))
+
+        self.assertEqual(reader.size, (640, 480))
+        self.assertEqual(reader.scale, 1.0)
+
+    def test_oversized_jpeg_is_decoded_at_the_smallest_fitting_scale(self):
+        path = self._save((2000, 1500), "JPEG")
+        # 3 MP over a 1 MP limit: 1/2 scale (750 kP) fits, full scale does not
+        with mock.patch.object(tiling, "MAX_DECODED_PIXELS", 1_000_000):
+            reader = self._reader(path)
+
+        self.assertEqual(reader.size, (1000, 750))
+        self.assertEqual(reader.scale, 0.5)
+
+    def test_jpeg_over_the_decompression_bomb_limit_is_still_tiled(self):
+        path = self._save((2000, 1500), "JPEG")
+        with mock.patch.object(Image, "MAX_IMAGE_PIXELS", 1_000_000), \
+                mock.patch.object(tiling, "MAX_DECODED_PIXELS", 1_000_000):
+            reader = self._reader(path)
+
+        self.assertEqual(reader.size, (1000, 750))
+
+    def test_jpeg_too_large_even_at_one_eighth_scale_is_refused(self):
+        path = self._save((2000, 1500), "JPEG")
+        # 1/8 scale is 250x188 = 47 kP
+        with mock.patch.object(tiling, "MAX_DECODED_PIXELS", 40_000):
+            with self.assertRaises(ValueError):
+                tiling._open_reader(path)
+
+    def test_oversized_png_is_refused(self):
+        path = self._save((2000, 1500), "PNG")
+        with mock.patch.object(tiling, "MAX_DECODED_PIXELS", 1_000_000):
+            with self.assertRaises(ValueError):
+                tiling._open_reader(path)
+
+    def test_draft_scale_accounts_for_rounding_up(self):
+        with mock.patch.object(tiling, "MAX_DECODED_PIXELS", 250_000):
+            self.assertEqual(tiling._draft_scale((1000, 1000)), 2)
+            # ceil(1001 / 2) ** 2 = 251001 no longer fits at 1/2
+            self.assertEqual(tiling._draft_scale((1001, 1001)), 4)
+
+
+class GridSizeTest(unittest.TestCase):
+    def test_whole_tiles_only(self):
+        self.assertEqual(tiling._grid_size((1000, 500), 224), (2, 4))
+
+    def test_short_sides_get_one_tile(self):
+        self.assertEqual(tiling._grid_size((100, 50), 224), (1, 1))
+        self.assertEqual(tiling._grid_size((1000, 50), 224), (1, 4))
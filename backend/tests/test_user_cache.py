@@ -0,0 +1,75 @@
+import unittest
+from unittest import mock
+
+from app.models.user import UserResponse
+from app.utils.user_cache import UserCache
+
+
+def _user(user_id: str) -> UserResponse:
+    return UserResponse(user_id=user_id, username=user_id, email=f"{user_id}@example.org", role="patient", is_verified=True)
+
+
+class UserCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("app.utils.user_cache.time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_hit_is_keyed_by_user_and_token(self):
+        cache = UserCache(ttl_seconds=60, max_entries=10)
+        cache.put("u1", "token-a", _user("u1"))
+
+        self.assertEqual(cache.get("u1", "token-a"), _user("u1"))
+        self.assertIsNone(cache.get("u1", "token-b"))
+        self.assertIsNone(cache.get("u2", "token-a"))
+
+    def test_entries_expire_after_ttl(self):
+        cache = UserCache(ttl_seconds=60, max_entries=10)
+        cache.put("u1", "token-a", _user("u1"))
+
+        self.now += 59.9
+        self.assertIsNotNone(cache.get("u1", "token-a"))
+        self.now += 0.1
+        self.assertIsNone(cache.get("u1", "token-a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_evicts_least_recently_used(self):
+        cache = UserCache(ttl_seconds=60, max_entries=2)
+        cache.put("u1", "token", _user("u1"))
+        cache.put("u2", "token", _user("u2"))
+        # Reading u1 makes u2 the least recently used
+        cache.get("u1", "token")
+        cache.put("u3", "token", _user("u3"))
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNotNone(cache.get("u1", "token"))
+        self.assertIsNone(cache.get("u2", "token"))
+        self.assertIsNotNone(cache.get("u3", "token"))
+
+    def test_invalidate_drops_every_token_of_the_user(self):
+        cache = UserCache(ttl_seconds=60, max_entries=10)
+        cache.put("u1", "token-a", _user("u1"))
+        cache.put("u1", "token-b", _user("u1"))
+        cache.put("u2", "token-a", _user("u2"))
+
+        cache.invalidate("u1")
+        cache.invalidate("unknown")
+
+        self.assertIsNone(cache.get("u1", "token-a"))
+        self.assertIsNone(cache.get("u1", "token-b"))
+        self.assertIsNotNone(cache.get("u2", "token-a"))
+        self.assertEqual(len(cache), 1)
+
+    def test_put_refreshes_expiry(self):
+        cache = UserCache(ttl_seconds=60, max_entries=10)
+        cache.put("u1", "token", _user("u1"))
+        self.now += 50
+        cache.put("u1", "token", _user("u1"))
+        self.now += 50
+
+        self.assertIsNotNone(cache.get("u1", "token"))
+
+
+if __name__ == "__main__":
+    unittest.main()
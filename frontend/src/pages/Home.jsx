@@ -69,20 +69,17 @@ function Home() {
     setError('')
 
     try {
-      // Upload image
+      // Upload image and run prediction in a single request
       const formData = new FormData()
       formData.append('file', selectedFile)
 
-      const uploadResponse = await api.post('/image/upload', formData, {
+      const predictResponse = await api.post('/image/analyze', formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
         },
       })
 
-      const imageId = uploadResponse.data.image_id
-
-      // Run prediction
-      const predictResponse = await api.post(`/image/predict/${imageId}`)
+      const imageId = predictResponse.data.image_id
       
       // Parse result
       let result